@@ -0,0 +1,49 @@
+"""Micro-benchmark for response structuring on large model outputs.
+
+Usage:
+    python bench_parser.py [size_kb] [repeats]
+
+Builds synthetic responses of at least `size_kb` KB per request type
+(default 200) and reports parse throughput.
+"""
+import sys
+import time
+
+from script_writing_agent.backends import MockBackend
+from script_writing_agent.response_parser import parse_response
+
+REQUEST_TYPES = ["plot_creation", "character_creation", "scene_creation", "dialogue_generation"]
+
+
+def build_response(request_type: str, size_kb: int) -> str:
+    """Concatenate distinct mock responses until the text reaches size_kb."""
+    backend = MockBackend()
+    parts = []
+    size = 0
+    i = 0
+    while size < size_kb * 1024:
+        part = backend.render(f"benchmark prompt {i}", request_type)
+        parts.append(part)
+        size += len(part) + 1
+        i += 1
+    return "\n".join(parts)
+
+
+def bench(size_kb: int, repeats: int) -> None:
+    print(f"{'request_type':<22}{'size':>10}{'best':>12}{'MB/s':>10}  fields")
+    for request_type in REQUEST_TYPES:
+        text = build_response(request_type, size_kb)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = parse_response(text, request_type)
+            best = min(best, time.perf_counter() - start)
+        counts = {k: len(v) if isinstance(v, (list, dict)) else 1 for k, v in result.items()}
+        mb_per_s = len(text) / best / 1e6
+        print(f"{request_type:<22}{len(text) // 1024:>8}KB{best * 1000:>10.2f}ms{mb_per_s:>10.1f}  {counts}")
+
+
+if __name__ == "__main__":
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    bench(size_kb, repeats)
@@ -0,0 +1,50 @@
+"""Offline load test of the script pipeline against the mock LLM backend.
+
+Usage:
+    python load_test.py [concurrency] [rounds]
+
+Latency and failure rate of the mock are set with MOCK_LATENCY_MU,
+MOCK_LATENCY_SIGMA and MOCK_FAILURE_RATE.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Must be set before the package creates its AIService singleton
+os.environ.setdefault("AI_BACKEND", "mock")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+
+from script_writing_agent import generate_script_async
+from script_writing_agent.ai_service import ai_service
+
+
+async def run(concurrency: int, rounds: int):
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for r in range(rounds):
+        prompts = [f"Load test story {r}-{i}" for i in range(concurrency)]
+        began = time.perf_counter()
+        results = await asyncio.gather(*[generate_script_async(p) for p in prompts])
+        elapsed = time.perf_counter() - began
+        for result in results:
+            latencies.append(result["script"]["metadata"]["generation_time"] if result["script"] else elapsed)
+            failures += result["status"] != "success"
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    backend = ai_service.backend
+    print(f"scripts:        {len(latencies)} ({failures} failed)")
+    print(f"wall time:      {wall:.2f}s")
+    print(f"p50 / p95:      {statistics.median(latencies):.3f}s / {latencies[int(len(latencies) * 0.95) - 1]:.3f}s")
+    if hasattr(backend, "simulated_seconds"):
+        print(f"backend calls:  {backend.calls}, simulated latency {backend.simulated_seconds:.2f}s total")
+    print(f"governor:       {ai_service.governor.get_stats()}")
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(run(concurrency, rounds))
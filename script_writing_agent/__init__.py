@@ -7,6 +7,10 @@ load_dotenv()
 from .agent import (
     generate_script,
     generate_script_async,
+    edit_script,
+    edit_script_async,
+    resume_script,
+    resume_script_async,
     analyze_prompt,
     ScriptRequest,
     ScriptResponse
@@ -15,6 +19,10 @@ from .agent import (
 __all__ = [
     'generate_script',
     'generate_script_async',
+    'edit_script',
+    'edit_script_async',
+    'resume_script',
+    'resume_script_async',
     'analyze_prompt',
     'ScriptRequest',
     'ScriptResponse'
@@ -11,6 +11,11 @@ import time
 # Import AI model integration (you'll need to implement this)
 # from .ai_integration import AIModel
 
+from .checkpoints import checkpoints, new_job_id
+from .event_loop import background_loop
+from .metrics import ScriptMetrics, current_script_metrics
+from .stage_graph import STAGE_COMPLETED, Stage, StageGraph, StageListener
+from .stage_memo import StageMemo, current_stage_memo, stage_memo
 from .tools import (
     create_plot,
     create_characters,
@@ -18,6 +23,7 @@ from .tools import (
     create_dialogue,
     check_continuity
 )
+from .tools.dialogue_writer import remember_dialogue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +32,16 @@ logger = logging.getLogger(__name__)
 # Initialize thread pool
 executor = ThreadPoolExecutor(max_workers=4)
 
+# Script pipeline: each stage starts as soon as the values it reads are ready
+script_pipeline = StageGraph([
+    Stage("plot", create_plot, inputs=("concept",)),
+    Stage("characters", create_characters, inputs=("concept",)),
+    Stage("scenes", create_scenes, inputs=("plot", "characters")),
+    Stage("dialogue", create_dialogue, inputs=("scenes", "characters")),
+    Stage("continuity", check_continuity, inputs=("plot", "characters", "scenes"),
+          output="continuity_notes"),
+])
+
 # Define input/output schemas
 class ScriptRequest(BaseModel):
     prompt: str = Field(..., description="User's creative prompt or story idea")
@@ -36,6 +52,8 @@ class ScriptResponse(BaseModel):
     status: str = "success"
     message: Optional[str] = None
     content: Optional[str] = None  # For raw conversational responses
+    job_id: Optional[str] = None  # Checkpoint job, for resuming a failed generation
+    failed_stages: Optional[List[str]] = None  # Stages that failed or only partly completed
 
 @lru_cache(maxsize=100)
 def analyze_prompt(prompt: str) -> Dict:
@@ -65,66 +83,230 @@ def analyze_prompt(prompt: str) -> Dict:
             "error": str(e)
         }
 
-async def generate_script_async(prompt: str, parameters: Dict = None) -> Dict:
-    """Generates a complete script using AI-driven components.
-    
-    Args:
-        prompt: User's creative prompt
-        parameters: Optional customization parameters
-        
-    Returns:
-        Dict containing the AI-generated script
+# Stage outputs a script carries, keyed by pipeline value name
+SCRIPT_VALUES = ("plot", "characters", "scenes", "dialogue", "continuity_notes")
+
+async def _run_pipeline(request_info: Dict, values: Dict, action: str,
+                        job_id: Optional[str] = None,
+                        listener: Optional[StageListener] = None,
+                        memo: Optional[StageMemo] = None) -> Dict:
+    """Run the script pipeline from `values` and package the script.
+
+    Stages whose output is already in `values` are skipped. With a memo,
+    stages whose inputs are unchanged since an earlier run reuse that run's
+    output. With a job ID, every completed stage output is checkpointed under it.
     """
     start_time = time.time()
-    logger.info(f"Starting AI script generation for: {prompt[:100]}...")
+    pending_writes: List[asyncio.Future] = []
+
+    def on_stage(event: str, stage: str, detail) -> None:
+        if job_id and event == STAGE_COMPLETED and script_pipeline.memoizable(detail):
+            # Written off the event loop; awaited before the result is returned
+            pending_writes.append(asyncio.ensure_future(asyncio.to_thread(
+                checkpoints.save, job_id, script_pipeline.stages[stage].produces, detail
+            )))
+        if listener is not None:
+            listener(event, stage, detail)
+
+    # Collect token/latency/cost metrics for every AI call made for this script
+    script_metrics = ScriptMetrics()
+    metrics_token = current_script_metrics.set(script_metrics)
+    memo_token = current_stage_memo.set(memo)
     
     try:
-        # Extract story elements from prompt using AI
-        request_info = analyze_prompt(prompt)
-        
-        # Generate core elements in parallel
-        plot_task = create_plot(request_info["concept"])
-        characters_task = create_characters(request_info["concept"])
-        plot, characters = await asyncio.gather(plot_task, characters_task)
-          # Generate scenes based on plot and characters
-        scenes = await create_scenes(plot, characters)
-        
-        # Generate dialogue and check continuity in parallel
-        dialogue_task = create_dialogue(scenes, characters)
-        continuity_task = check_continuity(plot, characters, scenes)
-        dialogue, continuity_notes = await asyncio.gather(dialogue_task, continuity_task)
+        # Run every stage, overlapping those that do not depend on each other
+        values = await script_pipeline.run(values, memo=memo, listener=on_stage)
         
         generation_time = time.time() - start_time
-        logger.info(f"Script generation completed in {generation_time:.2f}s")
+        # Tools report failures as error (or partial) results rather than raising
+        statuses = {name: values[name].get("status") if isinstance(values[name], dict) else None
+                    for name in SCRIPT_VALUES}
+        failed = [name for name, status in statuses.items() if status in ("error", "partial")]
+        logger.info(f"Script {action} completed in {generation_time:.2f}s"
+                    + (f" with failed stages: {', '.join(failed)}" if failed else ""))
         
         # Combine all elements
         script = {
             "prompt_analysis": request_info,
-            "plot": plot,
-            "characters": characters,
-            "scenes": scenes,
-            "dialogue": dialogue,
-            "continuity_notes": continuity_notes,
+            **{name: values[name] for name in SCRIPT_VALUES},
             "metadata": {
                 "generation_time": generation_time,
-                "ai_model_info": "Development mock response"
+                "ai_model_info": ", ".join(sorted(script_metrics.models)) or "cached",
+                "stages_run": list(script_metrics.stages),
+                "failed_stages": failed,
+                "metrics": script_metrics.as_dict()
             }
         }
         
-        return {
-            "status": "success",
-            "script": script,
-            "message": f"Script generated successfully in {generation_time:.2f}s"
-        }
+        if not failed:
+            result = {
+                "status": "success",
+                "script": script,
+                "message": f"Script {action} successfully in {generation_time:.2f}s"
+            }
+        else:
+            result = {
+                # Nothing usable if every stage failed
+                "status": "error" if all(statuses[name] == "error" for name in SCRIPT_VALUES) else "partial",
+                "script": script,
+                "message": f"Script {action} with failed stages ({', '.join(failed)}) "
+                           f"in {generation_time:.2f}s",
+                "failed_stages": failed
+            }
         
     except Exception as e:
-        logger.error(f"Error in script generation: {str(e)}")
+        logger.error(f"Error in script {action}: {str(e)}")
+        result = {
+            "status": "error",
+            "script": None,
+            "message": f"Error in script {action}: {str(e)}"
+        }
+    finally:
+        current_stage_memo.reset(memo_token)
+        current_script_metrics.reset(metrics_token)
+        if pending_writes:
+            await asyncio.gather(*pending_writes, return_exceptions=True)
+
+    if job_id:
+        # Lets a failed run be continued with resume_script
+        result["job_id"] = job_id
+    return result
+
+async def generate_script_async(prompt: str, parameters: Dict = None,
+                                job_id: Optional[str] = None,
+                                listener: Optional[StageListener] = None) -> Dict:
+    """Generates a complete script using AI-driven components.
+    
+    Args:
+        prompt: User's creative prompt
+        parameters: Optional customization parameters
+        job_id: Optional ID to checkpoint stages under (generated when
+            checkpoints are enabled); any earlier checkpoints of the job are discarded
+        listener: Optional callback for stage events (see stage_graph)
+        
+    Returns:
+        Dict containing the AI-generated script, and its "job_id" when checkpointed
+    """
+    logger.info(f"Starting AI script generation for: {prompt[:100]}...")
+
+    # Extract story elements from prompt using AI
+    request_info = analyze_prompt(prompt)
+
+    if checkpoints.enabled:
+        job_id = job_id or new_job_id()
+        await asyncio.to_thread(checkpoints.delete, job_id)
+        await asyncio.to_thread(checkpoints.start_job, job_id, {
+            "prompt": prompt, "parameters": parameters, "request_info": request_info
+        })
+    else:
+        job_id = None
+    return await _run_pipeline(request_info, {"concept": request_info["concept"]}, "generated",
+                               job_id, listener)
+
+async def resume_script_async(job_id: str, listener: Optional[StageListener] = None) -> Dict:
+    """Continue a checkpointed generation, skipping the stages that already completed.
+
+    Checkpoints that fail their integrity check, and outputs built on a
+    stage that has to run again, are regenerated.
+
+    Args:
+        job_id: ID returned by generate_script_async
+        listener: Optional callback for stage events (see stage_graph)
+
+    Returns:
+        Dict in the same shape as generate_script_async
+    """
+    try:
+        job = await asyncio.to_thread(checkpoints.load_job, job_id)
+    except ValueError as e:
+        job = None
+        logger.warning(str(e))
+    if job is None:
         return {
             "status": "error",
             "script": None,
-            "message": f"Error generating script: {str(e)}"
+            "message": f"No checkpoints found for job {job_id}"
         }
 
-def generate_script(prompt: str, parameters: Dict = None) -> Dict:
-    """Synchronous wrapper for generate_script_async."""
-    return asyncio.run(generate_script_async(prompt, parameters))
+    request_info = job["request_info"]
+    saved = await asyncio.to_thread(checkpoints.load, job_id, list(SCRIPT_VALUES))
+    values = script_pipeline.resumable({"concept": request_info["concept"], **saved})
+    logger.info(f"Resuming job {job_id} with completed stages: "
+                f"{', '.join(name for name in SCRIPT_VALUES if name in values) or 'none'}")
+    return await _run_pipeline(request_info, values, "resumed", job_id, listener)
+
+async def edit_script_async(script: Dict, plot: Optional[Dict] = None,
+                            characters: Optional[Dict] = None,
+                            scenes: Optional[Dict] = None) -> Dict:
+    """Apply edited stage outputs to a generated script and regenerate what depends on them.
+
+    Only stages whose inputs changed are recomputed:
+    - a plot edit regenerates scenes, dialogue and continuity notes
+    - a character edit keeps the scenes and regenerates the dialogue of the
+      scenes those characters appear in, plus the continuity notes
+    - a scene edit regenerates that scene's dialogue and the continuity notes
+
+    Args:
+        script: A script from generate_script_async (the full response or its "script")
+        plot: Edited plot stage result
+        characters: Edited character stage result
+        scenes: Edited scene stage result
+
+    Returns:
+        Dict in the same shape as generate_script_async; the script metadata
+        lists the stages that actually ran under "stages_run"
+    """
+    previous = script.get("script", script) if isinstance(script, dict) else None
+    if not previous or "prompt_analysis" not in previous:
+        return {
+            "status": "error",
+            "script": None,
+            "message": "A generated script is required"
+        }
+
+    request_info = previous["prompt_analysis"]
+    old_values = {name: previous[name] for name in SCRIPT_VALUES if name in previous}
+    old_values["concept"] = request_info["concept"]
+
+    # Outputs of the previous script are valid for the inputs they came from
+    script_pipeline.remember(old_values, stage_memo)
+    if all(name in old_values for name in ("scenes", "characters", "dialogue")):
+        remember_dialogue(old_values["scenes"], old_values["characters"], old_values["dialogue"])
+
+    edits = {name: value for name, value in (("plot", plot), ("characters", characters),
+                                              ("scenes", scenes)) if value is not None}
+    values = {"concept": request_info["concept"], **old_values, **edits}
+    # Downstream stages are recomputed (or reused from the memo if their inputs are unchanged)
+    for name in ("dialogue", "continuity_notes"):
+        values.pop(name, None)
+    if "plot" in edits and "scenes" not in edits:
+        # Scenes are built from the plot, so a new plot needs new scenes
+        values.pop("scenes", None)
+
+    logger.info(f"Regenerating script after editing: {', '.join(edits) or 'nothing'}")
+    return await _run_pipeline(request_info, values, "updated", memo=stage_memo)
+
+def generate_script(prompt: str, parameters: Dict = None,
+                    timeout: Optional[float] = None, job_id: Optional[str] = None) -> Dict:
+    """Synchronous wrapper for generate_script_async.
+
+    Runs on the shared background event loop, so it is safe to call from
+    many threads at once and concurrent calls share in-flight AI requests.
+
+    Args:
+        prompt: User's creative prompt
+        parameters: Optional customization parameters
+        timeout: Optional seconds to wait before cancelling the generation
+        job_id: Optional ID to checkpoint stages under
+    """
+    return background_loop.run(generate_script_async(prompt, parameters, job_id), timeout)
+
+def resume_script(job_id: str, timeout: Optional[float] = None) -> Dict:
+    """Synchronous wrapper for resume_script_async (see generate_script)."""
+    return background_loop.run(resume_script_async(job_id), timeout)
+
+def edit_script(script: Dict, plot: Optional[Dict] = None,
+                characters: Optional[Dict] = None, scenes: Optional[Dict] = None,
+                timeout: Optional[float] = None) -> Dict:
+    """Synchronous wrapper for edit_script_async (see generate_script)."""
+    return background_loop.run(edit_script_async(script, plot, characters, scenes), timeout)
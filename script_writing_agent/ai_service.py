@@ -1,10 +1,31 @@
-"""AI service module for script generation using Google's Gemini model."""
+"""AI service module for script generation using Google's Gemini model (or a local mock backend)."""
 import os
-from typing import Dict, Any, Optional, List
+import asyncio
+import time
+from typing import Dict, Any, Optional, AsyncIterator, Callable, List, Tuple
 import logging
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from .backends import LLMBackend, LLMResult, MockBackend, create_backend
+from .batching import build_batch_prompt, plan_batches, split_batch_response
+from .candidate_scoring import cast_names, choose_candidate
+from .circuit_breaker import CircuitBreakers, CircuitOpenError
+from .context_serializer import serialize_context
+from .hedging import Hedger
+from .model_catalog import qualify_model_name
+from .prefix_cache import PrefixCache
+from .prompt_templates import join_prompt, templates
+from .rate_limiter import RateGovernor, estimate_tokens
+from .metrics import metrics
+from .response_parser import parse_response
+from .response_validation import build_repair_prompt, find_problems, merge_fields
+from .response_cache import CONVERSATIONAL, ResponseCache, make_cache_key
+from .routing import DEFAULT_FAST_MODEL, ModelRouter, RouteChoice
+from .single_flight import SingleFlight
+
+# Picks the best of several candidate texts: (index, scores)
+CandidateChooser = Callable[[List[str]], Tuple[int, List[float]]]
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,163 +34,570 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 class AIService:
-    def __init__(self):
-        """Initialize the AI service with Gemini model configuration."""
-        # Configure the Gemini model
-        genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))        # Get available models and log them
-        models = genai.list_models()
-        for m in models:
-            logger.info(f"Available model: {m.name}")
-            
-        # Initialize the model using environment variable
-        model_name = os.getenv('MODEL', 'gemini-2.0-flash')  # Default to gemini-2.0-flash if not specified
-        
-        # Find the exact model name from available models
-        model_found = False
-        for m in models:
-            if model_name in m.name:
-                model_name = m.name
-                model_found = True
-                break
-                
-        if not model_found:
-            logger.warning(f"Model {model_name} not found, falling back to gemini-2.0-flash")
-            model_name = "models/gemini-2.0-flash"
-            
-        logger.info(f"Using model: {model_name}")
-        self.model = genai.GenerativeModel(model_name)
-        
-        # Configuration for the model
-        self.generation_config = {
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "candidate_count": 1,
-        }
-        
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        """Initialize the AI service with its model backend.
+
+        No network calls are made here; the model is resolved on first use.
+
+        Args:
+            backend (LLMBackend, optional): Model backend, defaults to the one
+                named by AI_BACKEND (Gemini unless set to "mock")
+        """
+        self.backend = backend or create_backend()
+        self._model_name = None
+
+        # Per-request-type model and generation config, with SLO downgrades
+        self.router = ModelRouter.from_env(metrics.model_latency_p95)
+
+        # Approximate token budget for the serialized context of one request
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+        # Packing of small same-shaped requests into one call (generate_batch)
+        self.batch_size = int(os.getenv("BATCH_SIZE", "4"))
+        self.batch_token_budget = int(os.getenv("BATCH_TOKEN_BUDGET", "4000"))
+
+        # Targeted follow-up calls for fields missing from a structured response
+        self.max_repair_rounds = int(os.getenv("REPAIR_MAX_ROUNDS", "2"))
+
+        # Content-addressed cache for raw model responses
+        self.cache = ResponseCache.from_env()
+
+        # Shared rate/concurrency governor for every model call
+        self.governor = RateGovernor.from_env()
+
+        # Coalesces identical concurrent requests into one model call
+        self.inflight = SingleFlight()
+
+        # Duplicates unusually slow calls (opt-in, capped by HEDGE_MAX_RATE)
+        self.hedger = Hedger.from_env(metrics.model_latency_percentile)
+
+        # Per-model circuit breakers; while a model's circuit is open, calls go
+        # to CIRCUIT_FALLBACK (a model name, "mock" or "none" to fail fast)
+        self.breakers = CircuitBreakers.from_env()
+        self.fallback = os.getenv("CIRCUIT_FALLBACK", os.getenv("FAST_MODEL", DEFAULT_FAST_MODEL)).strip()
+        self._fallback_backend: Optional[LLMBackend] = None
+
+        # Provider-side caching of the shared prompt prefix of script requests
+        self.prefix_cache = PrefixCache.from_env()
+
+        # Process-wide token/latency/cost metrics
+        self.metrics = metrics
+
+    async def get_model_name(self) -> str:
+        """Resolve the default model name on first use, off the event loop."""
+        if self._model_name is None:
+            self._model_name = await asyncio.to_thread(self.backend.default_model)
+            logger.info(f"Using model: {self._model_name} ({self.backend.name} backend)")
+        return self._model_name
+
+    async def select_route(self, request_type: Optional[str]) -> RouteChoice:
+        """Choose the model and generation config for a request type."""
+        return self.router.select(request_type, await self.get_model_name())
+
     async def generate_response(self, prompt: str, 
-                              context: Optional[Dict[str, Any]] = None) -> Dict:
+                              context: Optional[Dict[str, Any]] = None,
+                              candidate_count: Optional[int] = None) -> Dict:
         """Generate AI response for any component of the script.
+
+        With more than one candidate (from the argument or the route's
+        generation config), script requests get all candidates from a single
+        call and keep the one that scores best locally.
         
         Args:
             prompt (str): The prompt to send to the AI model
             context (Dict, optional): Additional context for the AI
+            candidate_count (int, optional): Candidates to request, overriding the route
             
         Returns:
             Dict: AI-generated response
         """
+        start_time = time.perf_counter()
+        request_type = context.get("request_type") if context else None
+        metric_type = request_type or CONVERSATIONAL
+        cache_status = "miss" if self.cache.is_enabled_for(request_type) else "bypass"
         try:
             logger.info(f"Generating AI response for prompt: {prompt[:100]}...")
             
-            # Construct the full prompt with context
-            full_prompt = prompt
-            if context and context.get("request_type"):  # Only add context prefix for script requests
-                full_prompt = f"Context: {context}\n\nPrompt: {prompt}"
-            logger.info(f"Sending prompt to Gemini model ({self.model.model_name})")
-            
-            # Generate response with minimal safety settings
-            response = await self.model.generate_content_async(
-                full_prompt,
-                generation_config=self.generation_config
+            # Construct the full prompt: shared instructions and context, then the request
+            prefix = self._prompt_prefix(context)
+            full_prompt = self._build_prompt(prompt, context, prefix)
+
+            route = await self.select_route(request_type)
+            if candidate_count is not None or not request_type:
+                route = self._with_candidates(route, candidate_count if request_type else 1)
+
+            choose = None
+            if route.generation_config.get("candidate_count", 1) > 1:
+                cast = cast_names(context.get("characters"))
+                choose = lambda texts: choose_candidate(texts, request_type, cast)
+
+            response_text, cache_status, call_metadata = await self._complete(
+                route, full_prompt, context, request_type, prefix, choose
             )
-            
-            # Parse and structure the response
-            if not response or not hasattr(response, 'text'):
-                raise Exception("Invalid response from AI model")
-                
-            response_text = response.text
-            if not response_text:
-                raise Exception("Empty response from AI model")
-            
-            logger.info(f"Raw model response: {response_text[:200]}...")
-                
+
             # If no specific request type, return the raw response
             if not context or not context.get("request_type"):
-                return {
-                    "status": "success",
-                    "content": response_text,
-                    "metadata": {
-                        "prompt": prompt,
-                        "context": context,
-                        "model": "gemini-2.0-flash"
-                    }
-                }
-                
-            # For script requests, convert the response text into structured format
-            structured_response = self._structure_ai_response(response_text, context)
-            logger.info(f"Generated structured response: {structured_response}")
-            
+                content = response_text
+            else:
+                # For script requests, convert the response text into structured format
+                content = self._structure_ai_response(response_text, context)
+                logger.info(f"Generated structured response: {content}")
+
+                # Ask only for the fields that are missing instead of regenerating everything
+                content, repair_metadata = await self._repair_structured(
+                    content, response_text, context, route, prefix
+                )
+                call_metadata = dict(call_metadata, **repair_metadata)
+
+            latency = time.perf_counter() - start_time
+            self.metrics.record_request(metric_type, cache_status, "success", latency)
             return {
                 "status": "success",
-                "content": structured_response,
+                "content": content,
                 "metadata": {
                     "prompt": prompt,
                     "context": context,
-                    "model": "gemini-2.0-flash"
+                    "model": route.model,
+                    "route_downgraded": route.downgraded,
+                    "cache": cache_status,
+                    "latency": round(latency, 3),
+                    **call_metadata
                 }
             }
             
         except Exception as e:
             logger.error(f"Error generating AI response: {str(e)}")
+            self.metrics.record_request(metric_type, cache_status, "error",
+                                        time.perf_counter() - start_time)
             return {
                 "status": "error",
                 "error": str(e)
             }
-        
-    async def _generate_mock_response(self, prompt: str, context: Optional[Dict[str, Any]]) -> Dict:
-        """Generate a mock response for development and testing.
-        This will be replaced with actual AI model integration."""
-        
-        request_type = context.get("request_type", "") if context else ""
-        
-        mock_content = {
-            "plot_creation": {
-                "structure": "three_act",
-                "acts": {
-                    "setup": "Initial situation and character introduction",
-                    "confrontation": "Main conflict development",
-                    "resolution": "Conflict resolution and conclusion"
-                },
-                "themes": ["Growth", "Change"],
-                "tone": "Dynamic"
-            },
-            "character_creation": {
-                "main_characters": [
-                    {
-                        "name": "Character 1",
-                        "role": "Protagonist",
-                        "description": "Main character description"
-                    }
-                ],
-                "supporting_characters": []
-            },
-            "scene_creation": {
-                "scenes": [
-                    {
-                        "id": "scene_1",
-                        "setting": "Initial location",
-                        "description": "Scene description"
-                    }
-                ]
-            },
-            "dialogue_generation": {
-                "exchanges": [
-                    {
-                        "character": "Character 1",
-                        "line": "Example dialogue"
+
+    async def generate_batch(self, prompts: List[str],
+                             context: Optional[Dict[str, Any]] = None,
+                             max_batch_size: Optional[int] = None,
+                             token_budget: Optional[int] = None,
+                             max_concurrency: Optional[int] = None) -> List[Dict]:
+        """Generate responses for several small, same-shaped prompts in few calls.
+
+        Prompts are packed into batch requests that share one context; each
+        answer is split back out and structured on its own. Items whose answer
+        is missing or fails to parse are retried as individual requests.
+
+        Args:
+            prompts (List[str]): Prompts sharing the same context and request type
+            context (Dict, optional): Context shared by all prompts
+            max_batch_size (int, optional): Maximum prompts per call
+            token_budget (int, optional): Maximum estimated prompt tokens per call
+            max_concurrency (int, optional): Batches in flight at once (unbounded if None)
+
+        Returns:
+            List[Dict]: One generate_response-style result per prompt, in order;
+                a failed prompt gets an error result without affecting the others
+        """
+        if not prompts:
+            return []
+
+        max_batch_size = max_batch_size or self.batch_size
+        token_budget = token_budget or self.batch_token_budget
+        request_type = context.get("request_type") if context else None
+        # A batched answer is split per item, so candidates cannot be compared as a whole
+        route = self._with_candidates(await self.select_route(request_type), 1)
+
+        prefix = self._prompt_prefix(context)
+        overhead = estimate_tokens(prefix)
+        batches = plan_batches(prompts, max_batch_size, token_budget, overhead)
+        results: List[Optional[Dict]] = [None] * len(prompts)
+        limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def run_limited(indices: List[int]) -> None:
+            if limit is None:
+                await run_batch(indices)
+                return
+            async with limit:
+                await run_batch(indices)
+
+        async def run_batch(indices: List[int]) -> None:
+            if len(indices) == 1:
+                results[indices[0]] = await self.generate_response(prompts[indices[0]], context)
+                return
+
+            start_time = time.perf_counter()
+            full_prompt = self._build_prompt(build_batch_prompt([prompts[i] for i in indices]), context, prefix)
+            cache_status = "miss" if self.cache.is_enabled_for(request_type) else "bypass"
+            try:
+                text, cache_status, call_metadata = await self._complete(
+                    route, full_prompt, context, request_type, prefix
+                )
+                answers = split_batch_response(text, len(indices))
+                status = "success"
+            except Exception as e:
+                logger.warning(f"Batch of {len(indices)} requests failed: {str(e)}")
+                answers, call_metadata, status = [None] * len(indices), {}, "error"
+            latency = time.perf_counter() - start_time
+            self.metrics.record_request(request_type or CONVERSATIONAL, cache_status, status, latency)
+
+            for index, answer in zip(indices, answers):
+                if answer is None:
+                    continue
+                content = self._structure_ai_response(answer, context) if request_type else answer
+                if not self._is_parsed(content):
+                    continue
+                results[index] = {
+                    "status": "success",
+                    "content": content,
+                    "metadata": {
+                        "prompt": prompts[index],
+                        "context": context,
+                        "model": route.model,
+                        "route_downgraded": route.downgraded,
+                        "cache": cache_status,
+                        "latency": round(latency, 3),
+                        "batch_size": len(indices),
+                        **call_metadata
                     }
-                ]
-            }
-        }.get(request_type, {})
-        
-        return {
-            "status": "success",
-            "content": mock_content,
-            "metadata": {
-                "prompt": prompt,
-                "context": context
-            }
+                }
+
+            failed = [i for i in indices if results[i] is None]
+            if failed:
+                logger.info(f"Retrying {len(failed)} of {len(indices)} batched requests individually")
+                retried = await asyncio.gather(*(self.generate_response(prompts[i], context) for i in failed))
+                for index, result in zip(failed, retried):
+                    results[index] = result
+
+        await asyncio.gather(*(run_limited(batch) for batch in batches))
+        return results
+
+    @staticmethod
+    def _is_parsed(content: Any) -> bool:
+        """Check that a structured answer has usable fields."""
+        if not isinstance(content, dict):
+            return bool(content)
+        if "error" in content:
+            return False
+        if content.get("structured") is False:
+            return bool(content.get("raw_response"))
+        return any(v for v in content.values() if isinstance(v, (list, dict)))
+
+    async def generate_response_stream(self, prompt: str,
+                                       context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Stream the raw AI response text as the model produces it.
+
+        Intended for conversational requests; no structuring is applied.
+
+        Args:
+            prompt (str): The prompt to send to the AI model
+            context (Dict, optional): Additional context for the AI
+
+        Yields:
+            str: Chunks of response text, in order
+        """
+        logger.info(f"Streaming AI response for prompt: {prompt[:100]}...")
+
+        start_time = time.perf_counter()
+        request_type = context.get("request_type") if context else None
+        cache_status = "bypass"
+        status = "error"
+        try:
+            full_prompt = self._build_prompt(prompt, context)
+
+            route = self._with_candidates(await self.select_route(request_type), 1)
+
+            use_cache = self.cache.is_enabled_for(request_type)
+            request_key = make_cache_key(route.model, full_prompt,
+                                         context, route.generation_config)
+            if use_cache:
+                cache_status = "miss"
+                cached = await self.cache.get_async(request_key)
+                if cached is not None:
+                    cache_status = "hit"
+                    status = "success"
+                    yield cached
+                    return
+
+            backend, model_name = self._call_target(route.model)
+            if backend is not self.backend or model_name != route.model:
+                use_cache = False  # Fallback answers are not stored under the routed model
+
+            # The governor covers opening the stream, so quota errors raised
+            # before the first chunk are retried like any other call
+            open_start = time.perf_counter()
+            opened = None
+            try:
+                stream = await self.governor.run(
+                    model_name,
+                    lambda: backend.open_stream(full_prompt, model_name,
+                                                route.generation_config, request_type),
+                    estimated_tokens=estimate_tokens(full_prompt)
+                )
+                opened = True
+            except Exception:
+                opened = False
+                raise
+            finally:
+                self._record_outcome(backend, model_name, opened, time.perf_counter() - open_start)
+
+            chunks = []
+            async for text in stream:
+                chunks.append(text)
+                yield text
+
+            if not chunks:
+                raise Exception("Empty response from AI model")
+            if use_cache:
+                await self.cache.set_async(request_key, "".join(chunks))
+            status = "success"
+        finally:
+            self.metrics.record_request(request_type or CONVERSATIONAL, cache_status, status,
+                                        time.perf_counter() - start_time)
+
+    def publish_stats(self) -> None:
+        """Copy the service's cache, governor and resilience counters into the metrics registry."""
+        self.metrics.set_gauges("response_cache", self.cache.get_stats())
+        governor_stats = self.governor.get_stats()
+        governor_stats.pop("models", None)
+        self.metrics.set_gauges("governor", governor_stats)
+        self.metrics.set_gauges("single_flight", self.inflight.stats)
+        self.metrics.set_gauges("routing", {"downgraded_routes": len(self.router.downgraded_routes())})
+        self.metrics.set_gauges("hedging", self.hedger.stats)
+        breaker_stats = self.breakers.get_stats()
+        breaker_stats.pop("models", None)
+        self.metrics.set_gauges("circuit_breaker", breaker_stats)
+        self.metrics.set_gauges("prefix_cache", self.prefix_cache.stats)
+
+    def _prompt_prefix(self, context: Optional[Dict[str, Any]]) -> str:
+        """Shared prompt prefix of a script request: system instructions and story bible.
+
+        Calls with the same context get the same prefix, so it can be cached
+        provider-side; conversational requests have no prefix.
+        """
+        if not context or not context.get("request_type"):  # Only add context prefix for script requests
+            return ""
+        serialized = serialize_context(context, self.context_token_budget)
+        system = templates.render("system")
+        return f"{system}\n\nContext:\n{serialized}" if serialized else system
+
+    def _build_prompt(self, prompt: str, context: Optional[Dict[str, Any]],
+                      prefix: Optional[str] = None) -> str:
+        """Prefix the prompt with instructions and compactly serialized context for script requests."""
+        if prefix is None:
+            prefix = self._prompt_prefix(context)
+        return join_prompt(prefix, f"Prompt: {prompt}") if prefix else prompt
+
+    async def _complete(self, route: RouteChoice, full_prompt: str,
+                        context: Optional[Dict[str, Any]],
+                        request_type: Optional[str],
+                        prefix: str = "",
+                        choose: Optional[CandidateChooser] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Get response text from the cache or a (coalesced) model call.
+
+        Args:
+            route (RouteChoice): Model and generation config to use
+            full_prompt (str): Prompt including any context prefix
+            context (Dict, optional): Request context, part of the cache key
+            request_type (str, optional): Request type
+            prefix (str): Shared leading part of `full_prompt` that may be cached provider-side
+            choose (Callable, optional): Picks the best of several candidates
+
+        Returns:
+            Tuple: Response text, cache status ("hit", "miss" or "bypass")
+                and usage metadata of the model call
+        """
+        use_cache = self.cache.is_enabled_for(request_type)
+        request_key = make_cache_key(route.model, full_prompt,
+                                     context, route.generation_config)
+        if use_cache:
+            response_text = await self.cache.get_async(request_key)
+            if response_text is not None:
+                logger.info(f"Serving cached response for {request_key[:12]}")
+                return response_text, "hit", {}
+        else:
+            self.cache.record_skip()
+
+        # Identical concurrent requests share a single model call
+        result = await self.inflight.do(
+            request_key,
+            lambda: self._fetch_text(route, full_prompt, request_type,
+                                     request_key if use_cache else None, prefix, choose)
+        )
+        call_metadata = {
+            "model": result.model,
+            "prompt_tokens": result.prompt_tokens,
+            "output_tokens": result.output_tokens,
+            "cached_prompt_tokens": result.cached_tokens,
+            "model_latency": round(result.latency, 3),
+            "retries": result.retries,
+            "candidate_scores": result.candidate_scores,
+        }
+        return result.text, "miss" if use_cache else "bypass", call_metadata
+
+    async def _fetch_text(self, route: RouteChoice, full_prompt: str,
+                          request_type: Optional[str] = None,
+                          cache_key: Optional[str] = None,
+                          prefix: str = "",
+                          choose: Optional[CandidateChooser] = None) -> LLMResult:
+        """Call the backend and record the call's metrics.
+
+        Args:
+            route (RouteChoice): Model and generation config to use
+            full_prompt (str): Prompt including any context prefix
+            request_type (str, optional): Request type, passed to the backend
+            cache_key (str, optional): Key to store the response under
+            prefix (str): Shared leading part of `full_prompt` that may be cached provider-side
+            choose (Callable, optional): Picks the best of several candidates; the
+                chosen one becomes the result text (and what is cached)
+
+        Returns:
+            LLMResult: Response text and usage
+        """
+        backend, model_name = self._call_target(route.model)
+        if backend is not self.backend or model_name != route.model:
+            cache_key = None  # Fallback answers are not stored under the routed model
+        logger.info(f"Sending prompt to {backend.name} model ({model_name})")
+
+        call_stats = {"retries": 0}
+        start_time = time.perf_counter()
+        succeeded = None
+        try:
+            # Send only the per-call suffix when the shared prefix is cached provider-side.
+            # Inside the try so a cancellation here still releases the breaker's probe slot.
+            prompt, cached_prefix = full_prompt, None
+            if prefix and backend is self.backend:
+                cached_prefix = await self.prefix_cache.handle_for(backend, model_name, prefix)
+                if cached_prefix:
+                    prompt = full_prompt[len(join_prompt(prefix, "")):]
+                start_time = time.perf_counter()
+
+            # Generate the response within the shared rate limits
+            # (quota errors are retried with backoff); a slow call may be hedged
+            result = await self.hedger.run(
+                request_type or CONVERSATIONAL,
+                model_name,
+                lambda: self.governor.run(
+                    model_name,
+                    lambda: backend.generate(prompt, model_name, route.generation_config,
+                                             request_type, cached_prefix=cached_prefix),
+                    estimated_tokens=estimate_tokens(full_prompt),
+                    call_stats=call_stats
+                )
+            )
+            succeeded = True
+        except Exception:
+            succeeded = False
+            self.metrics.record_model_call(request_type or CONVERSATIONAL, model_name,
+                                           time.perf_counter() - start_time,
+                                           call_stats["retries"], "error")
+            raise
+        finally:
+            self._record_outcome(backend, model_name, succeeded, time.perf_counter() - start_time)
+
+        result.latency = time.perf_counter() - start_time
+        result.retries = call_stats["retries"]
+        if choose is not None and result.candidates and len(result.candidates) > 1:
+            best, result.candidate_scores = choose(result.candidates)
+            result.text = result.candidates[best]
+            logger.info(f"Chose candidate {best + 1} of {len(result.candidates)} "
+                        f"(scores {result.candidate_scores})")
+        self.metrics.record_model_call(request_type or CONVERSATIONAL, result.model,
+                                       result.latency, result.retries, "success",
+                                       result.prompt_tokens, result.output_tokens)
+
+        logger.info(f"Raw model response: {result.text[:200]}...")
+        if cache_key:
+            await self.cache.set_async(cache_key, result.text)
+        return result
+
+    @staticmethod
+    def _with_candidates(route: RouteChoice, count: Optional[int]) -> RouteChoice:
+        """Copy of a route asking for `count` candidates (unchanged when None or equal)."""
+        if count is None or route.generation_config.get("candidate_count", 1) == count:
+            return route
+        return RouteChoice(route.model, dict(route.generation_config, candidate_count=max(1, count)),
+                           route.downgraded)
+
+    def _call_target(self, model_name: str) -> Tuple[LLMBackend, str]:
+        """Backend and model to call, failing over while the model's circuit is open.
+
+        Args:
+            model_name (str): Routed model
+
+        Returns:
+            Tuple: Backend and model name to use
+
+        Raises:
+            CircuitOpenError: If the circuit is open and no fallback is available
+        """
+        if self.breakers.allow(model_name):
+            return self.backend, model_name
+
+        fallback = self.fallback
+        if fallback.lower() == "mock":
+            if self._fallback_backend is None:
+                self._fallback_backend = MockBackend.from_env()
+            target = (self._fallback_backend, self._fallback_backend.default_model())
+        elif (fallback and fallback.lower() != "none"
+              and qualify_model_name(fallback) != model_name
+              and self.breakers.allow(qualify_model_name(fallback))):
+            target = (self.backend, qualify_model_name(fallback))
+        else:
+            raise CircuitOpenError(f"Circuit open for {model_name} and no fallback available")
+
+        self.breakers.stats["fallbacks"] += 1
+        logger.warning(f"Circuit open for {model_name}, using {target[1]} ({target[0].name} backend)")
+        return target
+
+    def _record_outcome(self, backend: LLMBackend, model_name: str,
+                        success: Optional[bool], latency: float) -> None:
+        """Feed a call outcome to the model's circuit breaker (the mock fallback has none)."""
+        if backend is self.backend:
+            self.breakers.record(model_name, success, latency)
+
+    async def _repair_structured(self, content: Any, response_text: str,
+                                 context: Dict[str, Any], route: RouteChoice,
+                                 prefix: str) -> Tuple[Any, Dict[str, Any]]:
+        """Fill missing or malformed fields of a structured response with targeted calls.
+
+        Args:
+            content (Any): Structured response to validate
+            response_text (str): Raw response it was parsed from
+            context (Dict): Request context (sets the request type and story context)
+            route (RouteChoice): Model and generation config to use
+            prefix (str): Shared prompt prefix of the request
+
+        Returns:
+            Tuple: Repaired content and metadata (rounds made, fields repaired,
+                fields still invalid)
+        """
+        request_type = context.get("request_type")
+        problems = find_problems(content, request_type)
+        repaired: List[str] = []
+        rounds = 0
+        while problems and rounds < self.max_repair_rounds:
+            rounds += 1
+            logger.info(f"Repairing {request_type} fields {', '.join(problems)} (round {rounds})")
+            repair_prompt = build_repair_prompt(response_text, problems, request_type)
+            full_prompt = self._build_prompt(repair_prompt, context, prefix)
+            try:
+                text, _, _ = await self._complete(route, full_prompt, context, request_type, prefix)
+            except Exception as e:
+                logger.warning(f"Repair of {request_type} failed: {str(e)}")
+                break
+            patch = self._structure_ai_response(text, context)
+            still_bad = find_problems(patch, request_type)
+            fixed = [field for field in problems if field not in still_bad]
+            content = merge_fields(content, patch, fixed, request_type)
+            repaired.extend(fixed)
+            problems = find_problems(content, request_type)
+
+        if problems:
+            logger.warning(f"{request_type} response still lacks {', '.join(problems)}")
+        return content, {
+            "repair_rounds": rounds,
+            "repaired_fields": repaired,
+            "invalid_fields": problems,
         }
-    
+
     def _structure_ai_response(self, response_text: str, context: Optional[Dict[str, Any]]) -> Dict:
         """Structure the AI response based on the request type.
         
@@ -183,150 +611,13 @@ class AIService:
         request_type = context.get("request_type", "") if context else ""
         
         try:
-            # For plot creation
-            if request_type == "plot_creation":
-                return {
-                    "structure": "dynamic",  # Let AI determine the structure
-                    "acts": self._extract_acts_from_text(response_text),
-                    "themes": self._extract_themes_from_text(response_text),
-                    "tone": self._extract_tone_from_text(response_text)
-                }
-            
-            # For character creation
-            elif request_type == "character_creation":
-                return {
-                    "main_characters": self._extract_characters_from_text(response_text, is_main=True),
-                    "supporting_characters": self._extract_characters_from_text(response_text, is_main=False)
-                }
-            
-            # For scene creation
-            elif request_type == "scene_creation":
-                return {
-                    "scenes": self._extract_scenes_from_text(response_text)
-                }
-            
-            # For dialogue generation
-            elif request_type == "dialogue_generation":
-                return {
-                    "exchanges": self._extract_dialogue_from_text(response_text)
-                }
-            
-            # For any other type, return the raw text in a basic structure
-            else:
-                return {
-                    "raw_response": response_text,
-                    "structured": False
-                }
-                
+            return parse_response(response_text, request_type)
         except Exception as e:
             logger.error(f"Error structuring AI response: {str(e)}")
             return {
                 "error": str(e),
                 "raw_response": response_text
             }
-    
-    def _extract_acts_from_text(self, text: str) -> Dict[str, str]:
-        """Extract acts from AI response text."""
-        # For now, basic text splitting - this can be enhanced with more sophisticated parsing
-        acts = {}
-        current_act = None
-        
-        for line in text.split('\n'):
-            if "ACT" in line.upper():
-                current_act = line.lower().replace("act", "").strip()
-                acts[current_act] = ""
-            elif current_act and line.strip():
-                acts[current_act] += line.strip() + " "
-        
-        return acts or {"setup": text}  # Default if no acts found
-    
-    def _extract_themes_from_text(self, text: str) -> List[str]:
-        """Extract themes from AI response text."""
-        # Look for theme-related keywords and extract following content
-        themes = []
-        text = text.lower()
-        
-        theme_indicators = ["theme:", "themes:", "thematic elements:", "key themes:"]
-        for indicator in theme_indicators:
-            if indicator in text:
-                theme_section = text.split(indicator)[1].split('\n')[0]
-                themes.extend([t.strip() for t in theme_section.split(',') if t.strip()])
-        
-        return themes or ["No explicit themes identified"]
-    
-    def _extract_tone_from_text(self, text: str) -> str:
-        """Extract tone from AI response text."""
-        # Look for tone-related keywords
-        text = text.lower()
-        tone_indicators = ["tone:", "mood:", "atmosphere:"]
-        
-        for indicator in tone_indicators:
-            if indicator in text:
-                return text.split(indicator)[1].split('\n')[0].strip()
-        
-        return "Neutral"  # Default tone
-    
-    def _extract_characters_from_text(self, text: str, is_main: bool = True) -> List[Dict]:
-        """Extract character information from AI response text."""
-        characters = []
-        lines = text.split('\n')
-        current_character = None
-        
-        for line in lines:
-            if ':' in line and not current_character:
-                name = line.split(':')[0].strip()
-                desc = line.split(':')[1].strip()
-                current_character = {
-                    "name": name,
-                    "description": desc,
-                    "role": "Protagonist" if is_main else "Supporting"
-                }
-                characters.append(current_character)
-            elif current_character and line.strip():
-                current_character["description"] += " " + line.strip()
-        
-        return characters
-    
-    def _extract_scenes_from_text(self, text: str) -> List[Dict]:
-        """Extract scene information from AI response text."""
-        scenes = []
-        lines = text.split('\n')
-        current_scene = None
-        
-        for i, line in enumerate(lines):
-            if line.strip().upper().startswith("SCENE"):
-                if current_scene:
-                    scenes.append(current_scene)
-                current_scene = {
-                    "id": f"scene_{len(scenes) + 1}",
-                    "setting": "",
-                    "description": ""
-                }
-            elif current_scene:
-                if not current_scene["setting"]:
-                    current_scene["setting"] = line.strip()
-                else:
-                    current_scene["description"] += line.strip() + " "
-        
-        if current_scene:
-            scenes.append(current_scene)
-        
-        return scenes
-    
-    def _extract_dialogue_from_text(self, text: str) -> List[Dict]:
-        """Extract dialogue exchanges from AI response text."""
-        exchanges = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if ':' in line:
-                character, dialogue = line.split(':', 1)
-                exchanges.append({
-                    "character": character.strip(),
-                    "line": dialogue.strip()
-                })
-        
-        return exchanges
 
 # Create a singleton instance
 ai_service = AIService()
@@ -0,0 +1,372 @@
+"""Pluggable LLM backends for the AI service.
+
+`GeminiBackend` talks to Google's Gemini models. `MockBackend` is a
+deterministic local stand-in with configurable latency and failure rate,
+used for offline development and load testing of the pipeline.
+
+Both can cache a shared prompt prefix provider-side (`create_prefix_cache`)
+and then generate from the returned handle plus the remaining prompt.
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol, Tuple
+
+import google.generativeai as genai
+
+from .batching import split_batch_prompt
+from .model_catalog import ModelCatalog, qualify_model_name
+from .prompt_templates import join_prompt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMResult:
+    """Text and usage returned by a backend for one call."""
+    text: str
+    model: str
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None  # Part of prompt_tokens served from a cached prefix
+    # All candidate texts when more than one was requested (text is the first)
+    candidates: Optional[List[str]] = None
+    # Filled in by the AI service after the call
+    latency: float = 0.0
+    retries: int = 0
+    candidate_scores: Optional[List[float]] = None
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        if self.prompt_tokens is None or self.output_tokens is None:
+            return None
+        return self.prompt_tokens + self.output_tokens
+
+
+class LLMBackend(Protocol):
+    """Interface every model backend implements."""
+
+    name: str
+
+    def default_model(self) -> str:
+        """Return the fully qualified name of the model to use by default.
+
+        May block (e.g. to list models); callers run it off the event loop.
+        """
+        ...
+
+    async def generate(self, prompt: str, model_name: str,
+                       generation_config: Dict[str, Any],
+                       request_type: Optional[str] = None,
+                       cached_prefix: Optional[str] = None) -> LLMResult:
+        """Generate a complete response.
+
+        With `cached_prefix`, `prompt` is only the part of the prompt that
+        follows the prefix stored under that handle. With a `candidate_count`
+        above 1 in `generation_config`, every candidate is returned.
+        """
+        ...
+
+    async def create_prefix_cache(self, model_name: str, prefix: str, ttl_seconds: float) -> str:
+        """Store a prompt prefix provider-side and return a handle for `generate`."""
+        ...
+
+    async def open_stream(self, prompt: str, model_name: str,
+                          generation_config: Dict[str, Any],
+                          request_type: Optional[str] = None) -> AsyncIterator[str]:
+        """Start a streaming response and return an iterator over text chunks."""
+        ...
+
+
+class GeminiBackend:
+    """Backend for Google's Gemini models."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, catalog: Optional[ModelCatalog] = None):
+        """Configure the Gemini SDK; no network calls are made here.
+
+        Args:
+            api_key (str, optional): API key, defaults to GOOGLE_API_KEY
+            catalog (ModelCatalog, optional): Catalog used to resolve the default model
+        """
+        genai.configure(api_key=api_key or os.getenv('GOOGLE_API_KEY'))
+        self.catalog = catalog or ModelCatalog.from_env()
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        # Models bound to a cached prefix, keyed by cached content name,
+        # with the time the cached content expires
+        self._cached_models: Dict[str, Tuple[genai.GenerativeModel, float]] = {}
+
+    def default_model(self) -> str:
+        # An explicit MODEL is used as-is; otherwise the default is looked up
+        # in the (file-cached) model catalog
+        explicit = os.getenv('MODEL')
+        if explicit:
+            return qualify_model_name(explicit)
+        return self.catalog.resolve('gemini-2.0-flash')
+
+    def get_model(self, model_name: str) -> genai.GenerativeModel:
+        """Return a reusable GenerativeModel for a model name."""
+        model = self._models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            self._models[model_name] = model
+        return model
+
+    async def create_prefix_cache(self, model_name: str, prefix: str, ttl_seconds: float) -> str:
+        # Models of expired cached contents can no longer be used
+        now = time.monotonic()
+        for name in [n for n, (_, expiry) in self._cached_models.items() if expiry <= now]:
+            del self._cached_models[name]
+        # Creating cached content is a blocking SDK call
+        cached = await asyncio.to_thread(
+            genai.caching.CachedContent.create,
+            model=model_name,
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        self._cached_models[cached.name] = (genai.GenerativeModel.from_cached_content(cached),
+                                            now + ttl_seconds)
+        return cached.name
+
+    async def generate(self, prompt: str, model_name: str,
+                       generation_config: Dict[str, Any],
+                       request_type: Optional[str] = None,
+                       cached_prefix: Optional[str] = None) -> LLMResult:
+        model = self._cached_models[cached_prefix][0] if cached_prefix else self.get_model(model_name)
+        response = await model.generate_content_async(
+            prompt,
+            generation_config=generation_config
+        )
+
+        candidates = None
+        if generation_config.get("candidate_count", 1) > 1:
+            # response.text only works for a single candidate
+            candidates = [
+                "".join(getattr(part, "text", "") for part in candidate.content.parts)
+                for candidate in getattr(response, "candidates", None) or []
+            ]
+            candidates = [text for text in candidates if text] or None
+            text = candidates[0] if candidates else None
+        else:
+            if not response or not hasattr(response, 'text'):
+                raise Exception("Invalid response from AI model")
+            text = response.text
+
+        if not text:
+            raise Exception("Empty response from AI model")
+
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResult(
+            text=text,
+            model=model_name,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+            cached_tokens=getattr(usage, "cached_content_token_count", None) or None,
+            candidates=candidates,
+        )
+
+    async def open_stream(self, prompt: str, model_name: str,
+                          generation_config: Dict[str, Any],
+                          request_type: Optional[str] = None) -> AsyncIterator[str]:
+        response = await self.get_model(model_name).generate_content_async(
+            prompt,
+            generation_config=generation_config,
+            stream=True
+        )
+
+        async def chunks() -> AsyncIterator[str]:
+            async for chunk in response:
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+
+        return chunks()
+
+
+class MockBackendError(Exception):
+    """Injected failure raised by MockBackend."""
+
+
+_MOCK_NAMES = ["Mara Quinn", "Theo Vance", "Ines Okafor", "Jonah Reyes", "Lena Park", "Sol Adeyemi"]
+_MOCK_SETTINGS = ["INT. ABANDONED STATION - NIGHT", "EXT. HARBOR DOCKS - DAWN",
+                  "INT. CROWDED MARKET - DAY", "EXT. ROOFTOP - DUSK", "INT. SAFEHOUSE - NIGHT"]
+_MOCK_THEMES = ["trust", "identity", "sacrifice", "belonging", "redemption", "ambition"]
+_MOCK_TONES = ["tense and atmospheric", "warm but bittersweet", "darkly comic", "hopeful"]
+
+
+class MockBackend:
+    """Deterministic local backend with modelled latency and failures."""
+
+    name = "mock"
+
+    def __init__(self, latency_mu: float = -0.5, latency_sigma: float = 0.5,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        """Initialize the mock backend.
+
+        Latency in seconds is sampled from lognormvariate(mu, sigma), so the
+        defaults give a median of about 0.6s with a long tail.
+
+        Args:
+            latency_mu (float): Mean of the underlying normal distribution
+            latency_sigma (float): Standard deviation of the underlying normal
+            failure_rate (float): Probability a call raises MockBackendError
+            seed (int, optional): Seed for latency/failure sampling
+        """
+        self.latency_mu = latency_mu
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.simulated_seconds = 0.0
+        # Local stand-in for provider-side prefix caching
+        self.cached_prefixes: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls) -> "MockBackend":
+        """Create a mock backend configured from MOCK_* environment variables."""
+        seed = os.getenv("MOCK_SEED")
+        return cls(
+            latency_mu=float(os.getenv("MOCK_LATENCY_MU", "-0.5")),
+            latency_sigma=float(os.getenv("MOCK_LATENCY_SIGMA", "0.5")),
+            failure_rate=float(os.getenv("MOCK_FAILURE_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def default_model(self) -> str:
+        return "models/mock"
+
+    async def _simulate_call(self) -> None:
+        """Sleep for a sampled latency and maybe raise an injected failure."""
+        self.calls += 1
+        latency = self._rng.lognormvariate(self.latency_mu, self.latency_sigma)
+        self.simulated_seconds += latency
+        await asyncio.sleep(latency)
+        if self._rng.random() < self.failure_rate:
+            raise MockBackendError("Injected mock backend failure")
+
+    def render(self, prompt: str, request_type: Optional[str] = None, variant: int = 0) -> str:
+        """Build the response text for a prompt; identical input gives identical output.
+
+        Args:
+            prompt (str): Full prompt
+            request_type (str, optional): Type of the request
+            variant (int): Candidate number; each gives a different answer
+        """
+        sub_prompts = split_batch_prompt(prompt)
+        if sub_prompts:
+            return "\n\n".join(f"### ITEM {n}\n{self.render(sub, request_type, variant)}"
+                                for n, sub in enumerate(sub_prompts, start=1))
+
+        seed_text = f"{request_type}|{prompt}" + (f"|{variant}" if variant else "")
+        seed = int(hashlib.sha256(seed_text.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        names = rng.sample(_MOCK_NAMES, 3)
+
+        if request_type == "plot_creation":
+            themes = rng.sample(_MOCK_THEMES, 2)
+            return "\n".join([
+                "ACT 1 - Setup",
+                f"{names[0]} stumbles onto a secret that changes everything.",
+                "ACT 2 - Confrontation",
+                f"{names[1]} forces {names[0]} to choose between safety and the truth.",
+                "ACT 3 - Resolution",
+                f"{names[0]} pays the price and earns a new kind of {themes[0]}.",
+                "",
+                f"Themes: {', '.join(themes)}",
+                f"Tone: {rng.choice(_MOCK_TONES)}",
+            ])
+        if request_type == "character_creation":
+            return "\n".join([
+                f"{names[0]}: A guarded investigator who hides their doubts behind routine.",
+                f"{names[1]}: A charismatic rival whose loyalty is never quite clear.",
+                f"{names[2]}: A loyal friend who keeps the group grounded.",
+            ])
+        if request_type == "scene_creation":
+            lines = []
+            for i, setting in enumerate(rng.sample(_MOCK_SETTINGS, 3), start=1):
+                lines.extend([
+                    f"SCENE {i}",
+                    setting,
+                    f"{names[i - 1]} confronts what the last scene set in motion.",
+                ])
+            return "\n".join(lines)
+        if request_type == "dialogue_generation":
+            return "\n".join([
+                f"{names[0]}: We can't keep pretending nothing happened.",
+                f"{names[1]}: Pretending is the only thing keeping us alive.",
+                f"{names[0]}: Then maybe it's time we stopped surviving.",
+            ])
+        if request_type == "continuity_check":
+            return "\n".join([
+                "Identified issues:",
+                f"- {names[1]}'s motivation shifts between scene 1 and scene 2 without explanation.",
+                "Suggestions:",
+                f"- Add a beat in scene 2 where {names[1]} reveals what they stand to lose.",
+            ])
+        return f"Here's an idea to build on: {names[0]} and {names[1]} in a story about {rng.choice(_MOCK_THEMES)}."
+
+    async def create_prefix_cache(self, model_name: str, prefix: str, ttl_seconds: float) -> str:
+        handle = f"cachedContents/mock-{hashlib.sha256(f'{model_name}|{prefix}'.encode('utf-8')).hexdigest()[:16]}"
+        self.cached_prefixes[handle] = prefix
+        return handle
+
+    async def generate(self, prompt: str, model_name: str,
+                       generation_config: Dict[str, Any],
+                       request_type: Optional[str] = None,
+                       cached_prefix: Optional[str] = None) -> LLMResult:
+        await self._simulate_call()
+        cached_tokens = None
+        if cached_prefix:
+            if cached_prefix not in self.cached_prefixes:
+                raise MockBackendError(f"Unknown cached prefix {cached_prefix}")
+            prefix = self.cached_prefixes[cached_prefix]
+            cached_tokens = max(1, len(prefix) // 4)
+            prompt = join_prompt(prefix, prompt)
+        count = max(1, int(generation_config.get("candidate_count", 1)))
+        candidates = [self.render(prompt, request_type, variant) for variant in range(count)]
+        return LLMResult(
+            text=candidates[0],
+            model=model_name,
+            prompt_tokens=max(1, len(prompt) // 4),
+            output_tokens=max(1, sum(len(text) for text in candidates) // 4),
+            cached_tokens=cached_tokens,
+            candidates=candidates if count > 1 else None,
+        )
+
+    async def open_stream(self, prompt: str, model_name: str,
+                          generation_config: Dict[str, Any],
+                          request_type: Optional[str] = None) -> AsyncIterator[str]:
+        await self._simulate_call()
+        words = self.render(prompt, request_type).split(" ")
+
+        async def chunks() -> AsyncIterator[str]:
+            for i in range(0, len(words), 8):
+                if i:
+                    await asyncio.sleep(0.02)
+                yield " ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "")
+
+        return chunks()
+
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """Create the backend named by `name` or the AI_BACKEND environment variable.
+
+    Args:
+        name (str, optional): "gemini" (default) or "mock"
+
+    Returns:
+        LLMBackend: The configured backend
+    """
+    name = (name or os.getenv("AI_BACKEND", "gemini")).lower()
+    if name == "mock":
+        logger.info("Using mock LLM backend")
+        return MockBackend.from_env()
+    if name != "gemini":
+        logger.warning(f"Unknown AI_BACKEND {name}, using gemini")
+    return GeminiBackend()
@@ -0,0 +1,89 @@
+"""Packing several small prompts into one model call and splitting the answer.
+
+Sub-requests are numbered in the batch prompt and the model is asked to
+start each answer with an `### ITEM <n>` marker line, which is how the
+response is split back into per-item answers.
+"""
+import re
+from typing import List, Optional
+
+from .rate_limiter import estimate_tokens
+
+_ITEM_RE = re.compile(r"^[ \t]*#{2,}[ \t]*ITEM[ \t]+(\d+)[ \t:#]*$", re.MULTILINE | re.IGNORECASE)
+_REQUEST_RE = re.compile(r"^### REQUEST (\d+)$", re.MULTILINE)
+
+
+def plan_batches(prompts: List[str], max_batch_size: int, token_budget: int,
+                 overhead_tokens: int = 0) -> List[List[int]]:
+    """Group prompt indices into batches bounded by size and token budget.
+
+    Args:
+        prompts (List[str]): Prompts to group, in order
+        max_batch_size (int): Maximum prompts per batch
+        token_budget (int): Maximum estimated prompt tokens per batch
+        overhead_tokens (int): Tokens every batch spends on shared context
+
+    Returns:
+        List[List[int]]: Batches of prompt indices, preserving order; a prompt
+            larger than the budget on its own gets a batch to itself
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = overhead_tokens
+    for index, prompt in enumerate(prompts):
+        cost = estimate_tokens(prompt) + 10  # marker and numbering
+        if current and (len(current) >= max_batch_size or used + cost > token_budget):
+            batches.append(current)
+            current = []
+            used = overhead_tokens
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(prompts: List[str]) -> str:
+    """Combine prompts into one numbered batch prompt."""
+    parts = [
+        f"Answer the following {len(prompts)} requests independently and completely.",
+        "Begin each answer with a line containing only \"### ITEM <number>\" for the "
+        "request it answers, and write nothing before the first such line.",
+    ]
+    for number, prompt in enumerate(prompts, start=1):
+        parts.append(f"### REQUEST {number}\n{prompt.strip()}")
+    return "\n\n".join(parts)
+
+
+def split_batch_prompt(prompt: str) -> Optional[List[str]]:
+    """Recover the sub-prompts of a batch prompt, or None if it is not one."""
+    matches = list(_REQUEST_RE.finditer(prompt))
+    if not matches:
+        return None
+    return [
+        prompt[m.end():matches[i + 1].start() if i + 1 < len(matches) else len(prompt)].strip()
+        for i, m in enumerate(matches)
+    ]
+
+
+def split_batch_response(text: str, count: int) -> List[Optional[str]]:
+    """Split a batch response into per-item answers.
+
+    Args:
+        text (str): Raw batch response
+        count (int): Number of items that were requested
+
+    Returns:
+        List[Optional[str]]: Answer text per item, None where an item is
+            missing or empty
+    """
+    answers: List[Optional[str]] = [None] * count
+    matches = list(_ITEM_RE.finditer(text))
+    for i, match in enumerate(matches):
+        number = int(match.group(1))
+        if not 1 <= number <= count or answers[number - 1] is not None:
+            continue
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        answer = text[match.end():end].strip()
+        answers[number - 1] = answer or None
+    return answers
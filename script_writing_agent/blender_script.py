@@ -2,7 +2,11 @@ import bpy
 import json
 import sys
 import os
-import requests
+
+# Blender runs this file as a script, so the shared transport is imported
+# from this directory rather than through the package
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from http_transport import http_client
 
 class BlenderSceneGenerator:
     def __init__(self):
@@ -29,22 +33,21 @@ class BlenderSceneGenerator:
         search_url = f'https://api.sketchfab.com/v3/models?q={query}&downloadable=true'
         
         try:
-            response = requests.get(search_url, headers=headers)
+            # All three requests reuse pooled keep-alive connections
+            response = http_client.get(search_url, headers=headers)
             results = response.json()
             
             if results.get('results'):
                 model = results['results'][0]
                 model_url = f"https://api.sketchfab.com/v3/models/{model['uid']}/download"
                 
-                dl_response = requests.get(model_url, headers=headers)
+                dl_response = http_client.get(model_url, headers=headers)
                 dl_data = dl_response.json()
                 
                 if dl_data.get('gltf', {}).get('url'):
-                    # Download the model file
+                    # Stream the model file to disk
                     model_file = os.path.join(os.path.dirname(bpy.data.filepath), f"{query}.glb")
-                    with open(model_file, 'wb') as f:
-                        f.write(requests.get(dl_data['gltf']['url']).content)
-                    return model_file
+                    return http_client.download(dl_data['gltf']['url'], model_file)
         except Exception as e:
             print(f"Sketchfab download error: {e}")
         return None
@@ -0,0 +1,99 @@
+"""Local scoring of alternative candidates returned by one model call.
+
+A candidate that does not parse scores 0. Otherwise its score adds up
+field completeness (weight 2), length against a per-type target (weight 1)
+and consistency of the character names it uses with the cast (weight 1).
+"""
+import re
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+from .response_parser import parse_response
+from .response_validation import REPAIR_INSTRUCTIONS, find_problems
+
+# Response length (characters) at which a candidate gets the full length score
+TARGET_LENGTHS = {
+    "plot_creation": 800,
+    "character_creation": 400,
+    "scene_creation": 800,
+    "dialogue_generation": 300,
+    "continuity_check": 400,
+}
+DEFAULT_TARGET_LENGTH = 300
+
+COMPLETENESS_WEIGHT = 2.0
+
+
+def cast_names(characters: Any) -> Set[str]:
+    """Collect lowercased character names from a character stage result."""
+    names: Set[str] = set()
+
+    def visit(value: Any) -> None:
+        if isinstance(value, dict):
+            name = value.get("name")
+            if isinstance(name, str) and name.strip():
+                names.add(name.strip().lower())
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+
+    visit(characters)
+    return names
+
+
+def _name_matches(name: str, cast: Set[str]) -> bool:
+    """Whether a speaker name refers to a cast member (full or first name)."""
+    name = name.strip().lower()
+    return any(name == member or name == member.split()[0] or member.startswith(name + " ")
+               for member in cast)
+
+
+def _consistency(content: Any, text: str, request_type: Optional[str], cast: Set[str]) -> float:
+    """Share of the names a candidate uses that belong to the cast (1.0 without a cast)."""
+    if not cast or request_type == "character_creation":
+        return 1.0
+    if request_type == "dialogue_generation":
+        speakers = [e.get("character", "") for e in content.get("exchanges", [])]
+        if not speakers:
+            return 0.0
+        return sum(1 for s in speakers if _name_matches(s, cast)) / len(speakers)
+    # Other stages: how much of the cast the candidate actually mentions
+    lowered = text.lower()
+    firsts = {member.split()[0] for member in cast}
+    return sum(1 for first in firsts if re.search(rf"\b{re.escape(first)}\b", lowered)) / len(firsts)
+
+
+def score_candidate(text: str, request_type: Optional[str], cast: Iterable[str] = ()) -> float:
+    """Score one candidate response; higher is better.
+
+    Args:
+        text (str): Raw candidate text
+        request_type (str, optional): Type of the request
+        cast (Iterable[str]): Lowercased names of the story's characters
+    """
+    if not text.strip():
+        return 0.0
+    try:
+        content = parse_response(text, request_type)
+    except Exception:
+        return 0.0
+
+    fields = REPAIR_INSTRUCTIONS.get(request_type or "", {})
+    completeness = 1.0 - len(find_problems(content, request_type)) / len(fields) if fields else 1.0
+    length = min(1.0, len(text) / TARGET_LENGTHS.get(request_type or "", DEFAULT_TARGET_LENGTH))
+    consistency = _consistency(content, text, request_type, set(cast))
+    return COMPLETENESS_WEIGHT * completeness + length + consistency
+
+
+def choose_candidate(texts: List[str], request_type: Optional[str],
+                     cast: Iterable[str] = ()) -> Tuple[int, List[float]]:
+    """Pick the best candidate.
+
+    Returns:
+        Tuple: Index of the best candidate (the earliest on ties) and every score
+    """
+    cast = set(cast)
+    scores = [round(score_candidate(text, request_type, cast), 3) for text in texts]
+    best = max(range(len(texts)), key=lambda i: (scores[i], -i))
+    return best, scores
@@ -0,0 +1,191 @@
+"""Durable checkpoints of script pipeline stages.
+
+Every completed stage output is written under the script's job ID, so a
+generation that fails part-way can be resumed without regenerating the
+stages that already finished. Each checkpoint file carries a SHA-256 of
+its payload and is written atomically; a checkpoint that fails the check
+is discarded and its stage runs again. Jobs older than the retention
+period are deleted, at most once per purge interval.
+
+All methods do blocking file I/O; async callers run them with
+`asyncio.to_thread`.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "promptplay", "checkpoints"
+)
+
+# Name of the per-job file describing the request
+JOB_FILE = "job.json"
+
+_JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """Per-job directory of checksummed JSON checkpoints."""
+
+    def __init__(self, root: str = DEFAULT_CHECKPOINT_DIR,
+                 retention_seconds: float = 7 * 24 * 3600, enabled: bool = True,
+                 purge_interval_seconds: float = 3600.0):
+        """Initialize the store; the directory is created on first write.
+
+        Args:
+            root (str): Directory holding one subdirectory per job
+            retention_seconds (float): Age after which a job's checkpoints are deleted
+            enabled (bool): Whether checkpoints are written at all
+            purge_interval_seconds (float): Minimum time between scans for expired jobs
+        """
+        self.root = root
+        self.retention_seconds = retention_seconds
+        self.enabled = enabled
+        self.purge_interval_seconds = purge_interval_seconds
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "saved": 0,
+            "loaded": 0,
+            "corrupt": 0,
+            "jobs_purged": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "CheckpointStore":
+        """Create a store configured by CHECKPOINT_* environment variables."""
+        return cls(
+            root=os.getenv("CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR),
+            retention_seconds=float(os.getenv("CHECKPOINT_RETENTION", str(7 * 24 * 3600))),
+            enabled=os.getenv("CHECKPOINTS_ENABLED", "true").lower() not in ("0", "false", "no"),
+            purge_interval_seconds=float(os.getenv("CHECKPOINT_PURGE_INTERVAL", "3600")),
+        )
+
+    def _job_dir(self, job_id: str) -> str:
+        if not _JOB_ID_RE.match(job_id):
+            raise ValueError(f"Invalid job ID: {job_id!r}")
+        return os.path.join(self.root, job_id)
+
+    def _write(self, path: str, name: str, payload: Any) -> None:
+        body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        record = {"name": name, "created": time.time(), "sha256": _digest(body), "payload": body}
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _read(self, path: str, name: str) -> Optional[Any]:
+        """Payload of a checkpoint file, or None if it is missing or fails its check."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            body = record["payload"]
+            if record.get("name") != name or _digest(body) != record.get("sha256"):
+                raise ValueError("checksum mismatch")
+            return json.loads(body)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding corrupt checkpoint {path}: {str(e)}")
+            self.stats["corrupt"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def start_job(self, job_id: str, request: Dict[str, Any]) -> None:
+        """Record what a job was asked to generate, replacing any earlier record."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self._last_purge >= self.purge_interval_seconds:
+            self._last_purge = now
+            self.purge_expired()
+        with self._lock:
+            self._write(os.path.join(self._job_dir(job_id), JOB_FILE), "job", request)
+
+    def load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The request recorded for a job, or None if the job is unknown."""
+        with self._lock:
+            return self._read(os.path.join(self._job_dir(job_id), JOB_FILE), "job")
+
+    def save(self, job_id: str, name: str, output: Any) -> None:
+        """Checkpoint one stage output; failures are logged, not raised."""
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                self._write(os.path.join(self._job_dir(job_id), f"{name}.json"), name, output)
+            self.stats["saved"] += 1
+        except Exception as e:
+            logger.warning(f"Could not checkpoint {name} for job {job_id}: {str(e)}")
+
+    def load(self, job_id: str, names: List[str]) -> Dict[str, Any]:
+        """Valid checkpointed outputs of a job, by name."""
+        outputs = {}
+        with self._lock:
+            for name in names:
+                output = self._read(os.path.join(self._job_dir(job_id), f"{name}.json"), name)
+                if output is not None:
+                    outputs[name] = output
+        self.stats["loaded"] += len(outputs)
+        return outputs
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """Delete jobs not written to within the retention period."""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        purged = 0
+        with self._lock:
+            for job_id in os.listdir(self.root):
+                path = os.path.join(self.root, job_id)
+                try:
+                    if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                        shutil.rmtree(path, ignore_errors=True)
+                        purged += 1
+                except OSError:
+                    continue
+        if purged:
+            logger.info(f"Purged {purged} expired checkpoint jobs")
+            self.stats["jobs_purged"] += purged
+        return purged
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+# Shared by the script pipeline
+checkpoints = CheckpointStore.from_env()
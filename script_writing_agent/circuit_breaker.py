@@ -0,0 +1,189 @@
+"""Per-model circuit breakers.
+
+A breaker watches the outcomes of recent calls to one model. When too many
+of them fail or are too slow it opens, and calls to that model fail fast
+(or go to a fallback) instead of piling onto a degraded provider. After a
+cool-down it lets a few probe calls through (half-open) and closes again
+once they succeed.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a model's circuit is open and no fallback is available."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open state machine for one model."""
+
+    def __init__(self, window: int = 20, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_seconds: float = 30.0, slow_call_rate: float = 0.5,
+                 open_seconds: float = 30.0, half_open_probes: int = 2):
+        """Initialize the breaker.
+
+        Args:
+            window (int): Recent calls the error and slow-call rates are computed over
+            min_calls (int): Calls needed in the window before the breaker can open
+            error_rate (float): Share of failed calls that opens the breaker
+            slow_call_seconds (float): Latency above which a call counts as slow
+            slow_call_rate (float): Share of slow calls that opens the breaker
+            open_seconds (float): Time the breaker stays open before probing
+            half_open_probes (int): Successful probes needed to close again
+        """
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes: deque = deque(maxlen=window)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record(self, success: Optional[bool], latency: float) -> bool:
+        """Record the outcome of an allowed call.
+
+        Args:
+            success (bool, optional): Whether the call succeeded; None when it
+                was cancelled and says nothing about the model
+            latency (float): Call duration in seconds
+
+        Returns:
+            bool: True if this outcome opened the breaker
+        """
+        failed = success is False
+        slow = success is True and latency > self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if success is None:
+                return False
+            if failed or slow:
+                self._open()
+                return True
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self.state = CLOSED
+                self._outcomes.clear()
+            return False
+        if self.state == OPEN or success is None:
+            return False
+
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return False
+        failures = sum(1 for f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, s in self._outcomes if s)
+        if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_call_rate:
+            self._open()
+            return True
+        return False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class CircuitBreakers:
+    """Circuit breakers keyed by model name."""
+
+    def __init__(self, **breaker_settings: Any):
+        """Initialize the registry.
+
+        Args:
+            **breaker_settings: Settings passed to every CircuitBreaker
+        """
+        self.breaker_settings = breaker_settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "fallbacks": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreakers":
+        """Create breakers configured by CIRCUIT_* environment variables."""
+        return cls(
+            window=int(os.getenv("CIRCUIT_WINDOW", "20")),
+            min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "10")),
+            error_rate=float(os.getenv("CIRCUIT_ERROR_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "30")),
+            slow_call_rate=float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.5")),
+            open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+            half_open_probes=int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "2")),
+        )
+
+    def _breaker(self, model_name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model_name)
+        if breaker is None:
+            breaker = CircuitBreaker(**self.breaker_settings)
+            self._breakers[model_name] = breaker
+        return breaker
+
+    def allow(self, model_name: str) -> bool:
+        """Whether a call may go to `model_name`; an allowed call must be recorded."""
+        with self._lock:
+            return self._breaker(model_name).allow()
+
+    def record(self, model_name: str, success: Optional[bool], latency: float) -> None:
+        """Record the outcome of a call allowed by `allow` (None if it was cancelled)."""
+        with self._lock:
+            breaker = self._breaker(model_name)
+            previous = breaker.state
+            opened = breaker.record(success, latency)
+            state = breaker.state
+        if opened:
+            logger.warning(f"Circuit for {model_name} opened (was {previous})")
+        elif state != previous:
+            logger.info(f"Circuit for {model_name} is now {state}")
+
+    def state(self, model_name: str) -> str:
+        with self._lock:
+            breaker = self._breakers.get(model_name)
+            return breaker.state if breaker else CLOSED
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Breaker counters, with the state of each model under "models"."""
+        with self._lock:
+            breakers = dict(self._breakers)
+            return {
+                "open": sum(1 for b in breakers.values() if b.state == OPEN),
+                "half_open": sum(1 for b in breakers.values() if b.state == HALF_OPEN),
+                "trips": sum(b.trips for b in breakers.values()),
+                "rejected": sum(b.rejected for b in breakers.values()),
+                "fallbacks": self.stats["fallbacks"],
+                "models": {name: b.state for name, b in breakers.items()},
+            }
@@ -0,0 +1,147 @@
+"""Compact, token-budgeted serialization of request context for prompts.
+
+Context dicts are rendered as indented `key: value` lines instead of Python
+reprs. Bookkeeping keys are dropped, long strings that repeat are replaced
+with a reference to their first occurrence, and when the result exceeds
+the token budget the least important sections are truncated first.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rate_limiter import estimate_tokens
+
+# Keys that carry no story information for the model
+NOISE_KEYS = {"status", "metadata", "request_type", "structured", "error_message"}
+
+# Lower number = more important; sections are truncated from the highest number down
+SECTION_PRIORITIES = {
+    "concept": 0,
+    "genre": 0,
+    "scene_id": 0,
+    "scene": 0,
+    "plot": 1,
+    "characters": 2,
+    "scenes": 3,
+}
+DEFAULT_PRIORITY = 5
+
+# Strings at least this long are deduplicated
+MIN_DEDUP_LENGTH = 40
+
+TRUNCATION_MARKER = "  ...(truncated)"
+
+
+class _Renderer:
+    """Renders nested values to lines while tracking repeated strings."""
+
+    def __init__(self):
+        self.seen: Dict[str, str] = {}
+
+    def scalar(self, value: Any, path: str) -> str:
+        text = " ".join(str(value).split())
+        if len(text) >= MIN_DEDUP_LENGTH:
+            first = self.seen.get(text)
+            if first is not None:
+                return f"(same as {first})"
+            self.seen[text] = path
+        return text
+
+    def render(self, value: Any, path: str, indent: int, lines: List[str], key: Optional[str] = None) -> None:
+        pad = "  " * indent
+        if isinstance(value, dict):
+            items = [(k, v) for k, v in value.items() if k not in NOISE_KEYS and not _is_empty(v)]
+            # Stage results wrap their payload in a key named like the stage
+            # ({"plot": {"plot": ...}}); skip the redundant level
+            while len(items) == 1 and items[0][0] == key and isinstance(items[0][1], (dict, list, tuple)):
+                value = items[0][1]
+                if not isinstance(value, dict):
+                    self.render(value, path, indent, lines, key)
+                    return
+                items = [(k, v) for k, v in value.items() if k not in NOISE_KEYS and not _is_empty(v)]
+            if not items:
+                return
+            if key is None:
+                # List item: put the first field on the "- " line
+                start = len(lines)
+                for k, v in items:
+                    self.render(v, f"{path}.{k}", indent + 1, lines, str(k))
+                if len(lines) > start:
+                    lines[start] = f"{pad}- {lines[start].lstrip()}"
+                return
+            lines.append(f"{pad}{key}:")
+            for k, v in items:
+                self.render(v, f"{path}.{k}", indent + 1, lines, str(k))
+        elif isinstance(value, (list, tuple)):
+            values = [v for v in value if not _is_empty(v)]
+            if not values:
+                return
+            label = f"{key}: " if key is not None else "- "
+            if all(not isinstance(v, (dict, list, tuple)) for v in values):
+                joined = ", ".join(self.scalar(v, f"{path}[{i}]") for i, v in enumerate(values))
+                lines.append(f"{pad}{label}{joined}")
+                return
+            lines.append(f"{pad}{label.rstrip()}")
+            for i, v in enumerate(values):
+                self.render(v, f"{path}[{i}]", indent + 1, lines)
+        else:
+            label = f"{key}: " if key is not None else "- "
+            lines.append(f"{pad}{label}{self.scalar(value, path)}")
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def serialize_context(context: Optional[Dict[str, Any]], token_budget: Optional[int] = None) -> str:
+    """Render request context as compact, deterministic text.
+
+    Args:
+        context (Dict, optional): Request context
+        token_budget (int, optional): Approximate maximum tokens for the output
+
+    Returns:
+        str: Serialized context (empty if there is nothing to include)
+    """
+    if not context:
+        return ""
+
+    renderer = _Renderer()
+    sections: List[Tuple[int, int, List[str]]] = []
+    # Render in priority order so the first occurrence of a repeated string
+    # lands in the section least likely to be truncated
+    keys = sorted(
+        (k for k in context if k not in NOISE_KEYS and not _is_empty(context[k])),
+        key=lambda k: (SECTION_PRIORITIES.get(k, DEFAULT_PRIORITY), list(context).index(k))
+    )
+    for order, key in enumerate(keys):
+        lines: List[str] = []
+        renderer.render(context[key], key, 0, lines, key)
+        if lines:
+            sections.append((SECTION_PRIORITIES.get(key, DEFAULT_PRIORITY), order, lines))
+
+    if token_budget is not None:
+        _truncate(sections, token_budget)
+
+    return "\n".join(line for _, _, lines in sections for line in lines)
+
+
+def _truncate(sections: List[Tuple[int, int, List[str]]], token_budget: int) -> None:
+    """Drop trailing lines from the least important sections until within budget."""
+    costs = [[estimate_tokens(line) + 1 for line in lines] for _, _, lines in sections]
+    total = sum(sum(c) for c in costs)
+    if total <= token_budget:
+        return
+
+    marker_cost = estimate_tokens(TRUNCATION_MARKER) + 1
+    for index in sorted(range(len(sections)), key=lambda i: (-sections[i][0], -sections[i][1])):
+        lines = sections[index][2]
+        cut = False
+        # Keep the section header line so the model still knows the section exists
+        while total > token_budget and len(lines) > 1:
+            lines.pop()
+            total -= costs[index].pop()
+            cut = True
+        if cut:
+            lines.append(TRUNCATION_MARKER)
+            total += marker_cost
+        if total <= token_budget:
+            return
@@ -0,0 +1,112 @@
+"""Long-lived background event loop for synchronous callers.
+
+The AI service keeps loop-bound state (single-flight tasks, rate limiter
+locks, the async model client), so every synchronous entry point submits
+its coroutines to one event loop running in a daemon thread instead of
+creating a new loop per call. Concurrent sync callers then share in-flight
+work, caches and connections.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """An event loop running in its own thread, started on first use."""
+
+    def __init__(self, name: str = "script-agent-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Background event loop has been shut down")
+            if not self.running:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(target=self._run, args=(loop, ready),
+                                          name=self.name, daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+                logger.info(f"Started background event loop {self.name}")
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop and return a thread-safe future."""
+        try:
+            loop = self._ensure_started()
+        except RuntimeError:
+            coro.close()
+            raise
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Cannot block on the background event loop from its own thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result.
+
+        Args:
+            coro (Coroutine): Coroutine to run
+            timeout (float, optional): Seconds to wait before cancelling it
+
+        Raises:
+            concurrent.futures.TimeoutError: If the timeout expires
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Cancel outstanding work, stop the loop and join its thread."""
+        with self._lock:
+            self._closed = True
+            loop, thread = self._loop, self._thread
+        if loop is None or thread is None or not thread.is_alive():
+            return
+
+        async def cancel_pending() -> None:
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_pending(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error cancelling pending work on {self.name}: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        logger.info(f"Stopped background event loop {self.name}")
+
+
+# Shared by every synchronous entry point in the process
+background_loop = BackgroundLoop()
+atexit.register(background_loop.shutdown)
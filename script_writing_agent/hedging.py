@@ -0,0 +1,131 @@
+"""Hedged model calls for tail-latency reduction.
+
+When a call has not returned within a high percentile of the latency
+observed for its request type and model, one duplicate call is started;
+whichever finishes first wins and the other is cancelled. Hedges are paid
+for from a budget that grows by `max_rate` per call, so at most that share
+of calls is ever duplicated.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Hedger:
+    """Runs model calls with at most one delayed duplicate."""
+
+    def __init__(self, latency_percentile: Callable[[str, str, float], Optional[Tuple[float, int]]],
+                 enabled: bool = False, percentile: float = 95.0, min_samples: int = 20,
+                 min_delay: float = 0.25, max_rate: float = 0.05, burst: float = 5.0):
+        """Initialize the hedger.
+
+        Args:
+            latency_percentile (Callable): Returns (latency seconds, sample count)
+                at a percentile for a (request_type, model), or None without data
+            enabled (bool): Whether calls are hedged at all
+            percentile (float): Latency percentile after which a duplicate is sent
+            min_samples (int): Calls observed before a request type is hedged
+            min_delay (float): Lower bound of the hedge delay in seconds
+            max_rate (float): Maximum share of calls that may be hedged
+            burst (float): Hedges that may be saved up for a burst of slow calls
+        """
+        self.latency_percentile = latency_percentile
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.burst = burst
+        self._credits = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "denied": 0,
+        }
+
+    @classmethod
+    def from_env(cls, latency_percentile: Callable[[str, str, float], Optional[Tuple[float, int]]]) -> "Hedger":
+        """Create a hedger configured by HEDGE_* environment variables."""
+        return cls(
+            latency_percentile,
+            enabled=os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+            min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+            min_delay=float(os.getenv("HEDGE_MIN_DELAY", "0.25")),
+            max_rate=float(os.getenv("HEDGE_MAX_RATE", "0.05")),
+        )
+
+    def delay_for(self, request_type: str, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a call, or None if it should not be hedged."""
+        if not self.enabled:
+            return None
+        stats = self.latency_percentile(request_type, model, self.percentile)
+        if stats is None or stats[1] < self.min_samples:
+            return None
+        return max(stats[0], self.min_delay)
+
+    def _earn(self) -> None:
+        with self._lock:
+            self.stats["calls"] += 1
+            self._credits = min(self._credits + self.max_rate, self.burst)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credits < 1.0:
+                self.stats["denied"] += 1
+                return False
+            self._credits -= 1.0
+            self.stats["hedged"] += 1
+            return True
+
+    async def run(self, request_type: str, model: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a call, hedging it once if it is slower than usual.
+
+        Args:
+            request_type (str): Request type whose latency sets the threshold
+            model (str): Model the call goes to
+            factory (Callable): Zero-argument coroutine factory performing the call
+
+        Returns:
+            Any: Result of whichever attempt succeeded first
+
+        Raises:
+            Exception: The first error, if every attempt failed
+        """
+        self._earn()
+        delay = self.delay_for(request_type, model)
+        if delay is None:
+            return await factory()
+
+        primary = asyncio.ensure_future(factory())
+        attempts = [primary]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done or not self._spend():
+                return await primary
+
+            logger.info(f"Hedging {request_type} call to {model} after {delay:.2f}s")
+            hedge = asyncio.ensure_future(factory())
+            attempts.append(hedge)
+
+            pending = set(attempts)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=attempts.index):
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,136 @@
+"""Shared pooled HTTP transport for outbound service calls.
+
+One keep-alive `requests.Session` is shared by every caller in the
+process, so repeated calls to the same host (TTS, asset downloads) reuse
+warm TCP/TLS connections. Connection limits can be set per host, and
+timeouts and retries apply to every request.
+
+This module only depends on `requests` so that standalone scripts run by
+Blender can import it without loading the rest of the package.
+"""
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _parse_host_limits(value: str) -> Dict[str, int]:
+    """Parse "host=limit,host=limit" into a mapping."""
+    limits = {}
+    for item in value.split(","):
+        host, sep, limit = item.partition("=")
+        if sep and host.strip() and limit.strip().isdigit():
+            limits[host.strip().lower()] = int(limit)
+    return limits
+
+
+class HttpTransport:
+    """Lazily created, pooled session with per-host limits, timeouts and retries."""
+
+    def __init__(self, max_connections_per_host: int = 10,
+                 host_limits: Optional[Dict[str, int]] = None,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 3, backoff_factor: float = 0.5):
+        """Initialize the transport; no connections are opened here.
+
+        Args:
+            max_connections_per_host (int): Pooled connections kept per host
+            host_limits (Dict[str, int], optional): Connection limits for
+                specific hosts; requests beyond the limit wait for a free connection
+            connect_timeout (float): Seconds allowed to establish a connection
+            read_timeout (float): Seconds allowed between bytes of a response
+            max_retries (int): Retries on connection errors and, for idempotent
+                methods, on 429/5xx responses
+            backoff_factor (float): Base of the exponential backoff between retries
+        """
+        self.max_connections_per_host = max_connections_per_host
+        self.host_limits = host_limits or {}
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "HttpTransport":
+        """Create a transport configured by HTTP_* environment variables."""
+        return cls(
+            max_connections_per_host=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10")),
+            host_limits=_parse_host_limits(os.getenv("HTTP_HOST_LIMITS", "")),
+            connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "60")),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+            backoff_factor=float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5")),
+        )
+
+    def _adapter(self, pool_size: int, block: bool) -> HTTPAdapter:
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                           max_retries=retry, pool_block=block)
+
+    @property
+    def session(self) -> requests.Session:
+        """The shared session, created on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    default = self._adapter(self.max_connections_per_host, block=False)
+                    session.mount("https://", default)
+                    session.mount("http://", default)
+                    # Hosts with an explicit limit get their own blocking pool
+                    for host, limit in self.host_limits.items():
+                        adapter = self._adapter(limit, block=True)
+                        session.mount(f"https://{host}", adapter)
+                        session.mount(f"http://{host}", adapter)
+                    self._session = session
+        return self._session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request over the shared pool (default timeouts apply)."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def download(self, url: str, path: str, chunk_size: int = 1 << 16, **kwargs) -> str:
+        """Stream a response body to a file and return its path.
+
+        Raises:
+            requests.HTTPError: If the server answers with an error status
+        """
+        with self.get(url, stream=True, **kwargs) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+        return path
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Shared by every outbound caller in the process
+http_client = HttpTransport.from_env()
@@ -0,0 +1,276 @@
+"""Token, latency and cost metrics for AI calls and pipeline stages.
+
+`metrics` is the process-wide registry; it renders in Prometheus text
+format for the /api/metrics endpoint. `ScriptMetrics` collects the calls
+made while generating one script so they can be attached to its metadata.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Recent observations kept per histogram for percentile queries
+PERCENTILE_WINDOW = 500
+
+
+def _price(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+class Histogram:
+    """Cumulative latency histogram plus a window of recent values."""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+        self.recent: deque = deque(maxlen=PERCENTILE_WINDOW)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentile(self, q: float, window: Optional[int] = None) -> Optional[float]:
+        """Return the q-th percentile (0-100) of recent values, or None if empty.
+
+        Args:
+            q (float): Percentile between 0 and 100
+            window (int, optional): Only consider the last `window` values
+        """
+        if not self.recent:
+            return None
+        recent = list(self.recent)
+        values = sorted(recent[-window:] if window else recent)
+        # Nearest-rank method
+        index = min(len(values) - 1, max(0, math.ceil(q / 100.0 * len(values)) - 1))
+        return values[index]
+
+
+class ScriptMetrics:
+    """Per-script collector of model calls and stage timings."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.request_types: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            "requests": 0, "model_calls": 0, "cache_hits": 0, "retries": 0,
+            "prompt_tokens": 0, "output_tokens": 0, "latency_seconds": 0.0, "cost_usd": 0.0,
+        })
+        self.models: set = set()
+
+    def as_dict(self) -> Dict[str, Any]:
+        totals = {"prompt_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "model_calls": 0}
+        for values in self.request_types.values():
+            for key in totals:
+                totals[key] += values[key]
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        return {
+            "stages": self.stages,
+            "request_types": {k: dict(v, cost_usd=round(v["cost_usd"], 6),
+                                      latency_seconds=round(v["latency_seconds"], 3))
+                              for k, v in self.request_types.items()},
+            "models": sorted(self.models),
+            "totals": totals,
+        }
+
+
+# Collector for the script currently being generated, if any
+current_script_metrics: contextvars.ContextVar[Optional[ScriptMetrics]] = contextvars.ContextVar(
+    "current_script_metrics", default=None
+)
+
+
+class MetricsRegistry:
+    """Process-wide metrics aggregated per request type, model and stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.input_price_per_mtok = _price("LLM_PRICE_INPUT_PER_MTOK", "0.10")
+        self.output_price_per_mtok = _price("LLM_PRICE_OUTPUT_PER_MTOK", "0.40")
+        self.requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.request_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self.model_calls: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.model_latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.prompt_tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.output_tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.retries: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.cost: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.stage_runs: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.stage_latency: Dict[str, Histogram] = defaultdict(Histogram)
+        self._gauges: Dict[str, Any] = {}
+
+    def cost_of(self, prompt_tokens: int, output_tokens: int) -> float:
+        """Estimated USD cost of a call from its token counts."""
+        return (prompt_tokens * self.input_price_per_mtok
+                + output_tokens * self.output_price_per_mtok) / 1_000_000
+
+    def record_request(self, request_type: str, cache_status: str, status: str, latency: float) -> None:
+        """Record one generate_response call as seen by its caller."""
+        with self._lock:
+            self.requests[(request_type, cache_status, status)] += 1
+            self.request_latency[request_type].observe(latency)
+        collector = current_script_metrics.get()
+        if collector is not None:
+            entry = collector.request_types[request_type]
+            entry["requests"] += 1
+            entry["cache_hits"] += cache_status == "hit"
+
+    def record_model_call(self, request_type: str, model: str, latency: float, retries: int,
+                          status: str, prompt_tokens: Optional[int] = None,
+                          output_tokens: Optional[int] = None) -> None:
+        """Record one call to the model provider."""
+        prompt_tokens = prompt_tokens or 0
+        output_tokens = output_tokens or 0
+        cost = self.cost_of(prompt_tokens, output_tokens)
+        key = (request_type, model)
+        with self._lock:
+            self.model_calls[(request_type, model, status)] += 1
+            self.model_latency[key].observe(latency)
+            self.prompt_tokens[key] += prompt_tokens
+            self.output_tokens[key] += output_tokens
+            self.retries[key] += retries
+            self.cost[key] += cost
+        collector = current_script_metrics.get()
+        if collector is not None:
+            entry = collector.request_types[request_type]
+            entry["model_calls"] += 1
+            entry["retries"] += retries
+            entry["prompt_tokens"] += prompt_tokens
+            entry["output_tokens"] += output_tokens
+            entry["latency_seconds"] += latency
+            entry["cost_usd"] += cost
+            collector.models.add(model)
+
+    def record_stage(self, stage: str, latency: float, status: str) -> None:
+        """Record one pipeline stage run."""
+        with self._lock:
+            self.stage_runs[(stage, status)] += 1
+            self.stage_latency[stage].observe(latency)
+        collector = current_script_metrics.get()
+        if collector is not None:
+            collector.stages[stage] = {"seconds": round(latency, 3), "status": status}
+
+    async def timed_stage(self, stage: str, awaitable: Awaitable[Dict]) -> Dict:
+        """Await a stage coroutine and record its duration and status.
+
+        Args:
+            stage (str): Stage name
+            awaitable (Awaitable): Stage coroutine returning a result dict
+
+        Returns:
+            Dict: The stage result
+        """
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await awaitable
+            status = result.get("status", "success") if isinstance(result, dict) else "success"
+            return result
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, status)
+
+    def latency_percentile(self, request_type: str, q: float) -> Optional[float]:
+        """Recent request latency percentile for a request type."""
+        with self._lock:
+            histogram = self.request_latency.get(request_type)
+            return histogram.percentile(q) if histogram else None
+
+    def model_latency_percentile(self, request_type: str, model: str, q: float,
+                                 window: Optional[int] = None) -> Optional[Tuple[float, int]]:
+        """Recent model call latency percentile and sample count for a request type and model."""
+        with self._lock:
+            histogram = self.model_latency.get((request_type, model))
+            if histogram is None or not histogram.recent:
+                return None
+            samples = min(len(histogram.recent), window or len(histogram.recent))
+            return histogram.percentile(q, window), samples
+
+    def model_latency_p95(self, request_type: str, model: str,
+                          window: Optional[int] = None) -> Optional[Tuple[float, int]]:
+        """Recent p95 model call latency and sample count for a request type and model."""
+        return self.model_latency_percentile(request_type, model, 95, window)
+
+    def set_gauges(self, name: str, values: Dict[str, Any]) -> None:
+        """Register a snapshot of numeric gauges (e.g. cache or governor stats)."""
+        with self._lock:
+            self._gauges[name] = values
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            _counter(lines, "promptplay_ai_requests_total", "AI service requests",
+                     ("request_type", "cache", "status"), self.requests)
+            _histogram(lines, "promptplay_ai_request_latency_seconds", "AI service request latency",
+                       ("request_type",), self.request_latency)
+            _counter(lines, "promptplay_llm_calls_total", "Model provider calls",
+                     ("request_type", "model", "status"), self.model_calls)
+            _histogram(lines, "promptplay_llm_call_latency_seconds", "Model provider call latency",
+                       ("request_type", "model"), self.model_latency)
+            _counter(lines, "promptplay_llm_prompt_tokens_total", "Prompt tokens sent",
+                     ("request_type", "model"), self.prompt_tokens)
+            _counter(lines, "promptplay_llm_output_tokens_total", "Output tokens received",
+                     ("request_type", "model"), self.output_tokens)
+            _counter(lines, "promptplay_llm_retries_total", "Retries of model calls",
+                     ("request_type", "model"), self.retries)
+            _counter(lines, "promptplay_llm_cost_usd_total", "Estimated model cost in USD",
+                     ("request_type", "model"), self.cost)
+            _counter(lines, "promptplay_stage_runs_total", "Pipeline stage runs",
+                     ("stage", "status"), self.stage_runs)
+            _histogram(lines, "promptplay_stage_duration_seconds", "Pipeline stage duration",
+                       ("stage",), self.stage_latency)
+            for name, values in sorted(self._gauges.items()):
+                for key, value in sorted(values.items()):
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        metric = f"promptplay_{name}_{key}"
+                        lines.append(f"# TYPE {metric} gauge")
+                        lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    values = values if isinstance(values, tuple) else (values,)
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+             values: Dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key in sorted(values):
+        lines.append(f"{name}{_labels(label_names, key)} {values[key]}")
+
+
+def _histogram(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+               histograms: Dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key in sorted(histograms):
+        h = histograms[key]
+        for bound, count in zip(h.buckets, h.counts):
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_labels(label_names, key, le)} {count}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(label_names, key, le)} {h.count}")
+        lines.append(f"{name}_sum{_labels(label_names, key)} {h.total}")
+        lines.append(f"{name}_count{_labels(label_names, key)} {h.count}")
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
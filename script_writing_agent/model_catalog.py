@@ -0,0 +1,112 @@
+"""Lazily loaded, file-cached catalog of available Gemini models.
+
+Listing models is a network round trip, so it only happens when a model
+name actually needs resolving, and the result is kept on disk for a TTL.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "promptplay", "models.json"
+)
+FALLBACK_MODEL = "models/gemini-2.0-flash"
+
+
+def qualify_model_name(name: str) -> str:
+    """Return a model name with the "models/" prefix the SDK expects."""
+    return name if "/" in name else f"models/{name}"
+
+
+class ModelCatalog:
+    """Model listing that is fetched on demand and persisted to a JSON file."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CATALOG_PATH,
+                 ttl_seconds: float = 24 * 3600):
+        """Initialize the catalog.
+
+        Args:
+            path (str, optional): JSON file the listing is persisted to
+            ttl_seconds (float): How long a persisted listing stays valid
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._names: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelCatalog":
+        """Create a catalog configured from MODEL_CATALOG_* environment variables."""
+        return cls(
+            path=os.getenv("MODEL_CATALOG_PATH", DEFAULT_CATALOG_PATH) or None,
+            ttl_seconds=float(os.getenv("MODEL_CATALOG_TTL", str(24 * 3600))),
+        )
+
+    def _load(self) -> Optional[List[str]]:
+        """Read a still-valid listing from disk."""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if time.time() - data.get("fetched_at", 0) > self.ttl_seconds:
+                return None
+            return list(data.get("models", []))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable model catalog {self.path}: {str(e)}")
+            return None
+
+    def _save(self, names: List[str]) -> None:
+        """Persist a listing to disk, best effort."""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"fetched_at": time.time(), "models": names}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist model catalog: {str(e)}")
+
+    def names(self) -> List[str]:
+        """Return available model names, listing them from the API if needed."""
+        with self._lock:
+            if self._names is None:
+                names = self._load()
+                if names is None:
+                    names = [m.name for m in genai.list_models()]
+                    for name in names:
+                        logger.info(f"Available model: {name}")
+                    self._save(names)
+                self._names = names
+            return self._names
+
+    def resolve(self, model_name: str) -> str:
+        """Find the fully qualified name of a model in the catalog.
+
+        Args:
+            model_name (str): Full or partial model name
+
+        Returns:
+            str: Matching catalog name, or the fallback model if none matches
+        """
+        try:
+            for name in self.names():
+                if model_name in name:
+                    return name
+        except Exception as e:
+            logger.warning(f"Could not list models: {str(e)}")
+            return qualify_model_name(model_name)
+
+        logger.warning(f"Model {model_name} not found, falling back to {FALLBACK_MODEL}")
+        return FALLBACK_MODEL
@@ -0,0 +1,105 @@
+"""Provider-side caching of shared prompt prefixes.
+
+All calls made for one script stage share a prompt prefix (system
+instructions plus story bible). Backends that implement
+`create_prefix_cache` store such a prefix once and return a handle; later
+calls send only their suffix together with the handle. Gemini implements
+this with cached contents, the mock backend with a local stand-in.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .rate_limiter import estimate_tokens
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Handles are not used this close to their expiry
+EXPIRY_MARGIN_SECONDS = 30.0
+
+
+class PrefixCache:
+    """Creates and reuses prefix cache handles per backend, model and prefix."""
+
+    def __init__(self, enabled: bool = True, min_tokens: int = 4096, ttl_seconds: float = 600.0):
+        """Initialize the prefix cache.
+
+        Args:
+            enabled (bool): Whether prefixes are cached at all
+            min_tokens (int): Smallest prefix worth caching (providers enforce
+                a minimum size for cached content)
+            ttl_seconds (float): Lifetime requested for each cached prefix
+        """
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        # (backend, model, prefix digest) -> (handle or None after a failure, expiry)
+        self._handles: Dict[Tuple[str, str, str], Tuple[Optional[str], float]] = {}
+        self._creating = SingleFlight()
+        self.stats = {
+            "created": 0,
+            "used": 0,
+            "failures": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "PrefixCache":
+        """Create a prefix cache configured by PREFIX_CACHE_* environment variables."""
+        return cls(
+            enabled=os.getenv("PREFIX_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            min_tokens=int(os.getenv("PREFIX_CACHE_MIN_TOKENS", "4096")),
+            ttl_seconds=float(os.getenv("PREFIX_CACHE_TTL", "600")),
+        )
+
+    async def handle_for(self, backend: Any, model_name: str, prefix: str) -> Optional[str]:
+        """Return a handle for `prefix` on a backend's model, creating it if needed.
+
+        Args:
+            backend (LLMBackend): Backend the call will go to
+            model_name (str): Model the call will go to
+            prefix (str): Shared prompt prefix
+
+        Returns:
+            str, optional: Handle to pass as `cached_prefix`, or None when the
+                prefix is too small, the backend cannot cache or creation failed
+        """
+        if (not self.enabled or not hasattr(backend, "create_prefix_cache")
+                or estimate_tokens(prefix) < self.min_tokens):
+            return None
+        key = (backend.name, model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        entry = self._handles.get(key)
+        if entry is not None and entry[1] - EXPIRY_MARGIN_SECONDS > time.time():
+            handle = entry[0]
+        else:
+            # Concurrent calls for the same prefix wait for a single creation
+            handle = await self._creating.do("|".join(key), lambda: self._create(backend, model_name, prefix, key))
+        if handle is not None:
+            self.stats["used"] += 1
+        return handle
+
+    async def _create(self, backend: Any, model_name: str, prefix: str,
+                      key: Tuple[str, str, str]) -> Optional[str]:
+        self.purge_expired()
+        try:
+            handle = await backend.create_prefix_cache(model_name, prefix, self.ttl_seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Do not retry a failing prefix (e.g. unsupported model) until it would have expired
+            logger.warning(f"Could not cache prompt prefix for {model_name}: {str(e)}")
+            self.stats["failures"] += 1
+            self._handles[key] = (None, time.time() + self.ttl_seconds)
+            return None
+        logger.info(f"Cached {estimate_tokens(prefix)}-token prompt prefix for {model_name} as {handle}")
+        self.stats["created"] += 1
+        self._handles[key] = (handle, time.time() + self.ttl_seconds)
+        return handle
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        for key in [k for k, (_, expiry) in self._handles.items() if expiry <= now]:
+            del self._handles[key]
@@ -0,0 +1,216 @@
+"""Prompt templates for the script pipeline.
+
+Templates are whitespace-normalized and parsed once when registered, so
+rendering is a single join. Script requests are sent as a shared prefix
+(system instructions plus the story bible built from the request context)
+followed by a per-call suffix. Calls that share a story context share the
+exact same prefix, which lets the provider cache it (see prefix_cache.py).
+"""
+import string
+import textwrap
+from typing import Any, Dict, List, Optional, Tuple
+
+# Joins the shared prefix and the per-call suffix of a prompt
+PROMPT_SEPARATOR = "\n\n"
+
+
+def normalize_whitespace(text: str) -> str:
+    """Dedent, strip every line and collapse runs of blank lines."""
+    lines = [line.strip() for line in textwrap.dedent(text).strip().splitlines()]
+    normalized: List[str] = []
+    for line in lines:
+        if line or (normalized and normalized[-1]):
+            normalized.append(line)
+    return "\n".join(normalized)
+
+
+def join_prompt(prefix: str, suffix: str) -> str:
+    """Full prompt text for a prefix and suffix."""
+    return f"{prefix}{PROMPT_SEPARATOR}{suffix}" if prefix else suffix
+
+
+class PromptTemplate:
+    """A normalized template with `{field}` placeholders, parsed once."""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = normalize_whitespace(text)
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in string.Formatter().parse(self.text):
+            if field is not None and (not field.isidentifier() or spec or conversion):
+                raise ValueError(f"Template {name}: only plain {{name}} fields are supported, got {{{field}}}")
+            self._parts.append((literal, field))
+        self.fields = frozenset(field for _, field in self._parts if field)
+
+    def render(self, **values: Any) -> str:
+        """Fill in the template's fields.
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        missing = self.fields.difference(values)
+        if missing:
+            raise KeyError(f"Template {self.name} is missing values for: {', '.join(sorted(missing))}")
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field:
+                out.append(str(values[field]))
+        return "".join(out)
+
+
+class TemplateRegistry:
+    """Named prompt templates shared by the tool modules."""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, text: str) -> PromptTemplate:
+        """Compile and register (or replace) a template."""
+        template = PromptTemplate(name, text)
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, **values: Any) -> str:
+        return self._templates[name].render(**values)
+
+    def names(self) -> List[str]:
+        return sorted(self._templates)
+
+
+templates = TemplateRegistry()
+
+templates.register("system", """
+    You are an experienced screenwriter developing an original script.
+    Use the story context below as the source of truth for names, events and tone.
+    Answer only the request that follows it, in plain text.
+""")
+
+templates.register("plot", """
+    Based on this story concept: "{concept}"
+    {genre_note}create a compelling and original plot structure.
+
+    Consider:
+    - Natural story progression and pacing
+    - Key plot points and turning points
+    - Thematic elements and motifs
+    - Character development opportunities
+    - Conflict escalation and resolution
+    - Subplot integration
+    - Story stakes and tension
+""")
+
+templates.register("characters", """
+    Analyze this story concept: "{concept}"
+    {genre_note}Create a cast of characters that would naturally emerge from this story.
+    Consider:
+    - Main character(s) with detailed personalities
+    - Supporting characters that enhance the story
+    - Antagonistic forces (not necessarily traditional villains)
+    - Character relationships and dynamics
+    - Character arcs and growth opportunities
+    - Cultural and demographic authenticity
+""")
+
+templates.register("scenes", """
+    Based on this plot structure and these characters,
+    create a sequence of compelling scenes that bring the story to life.
+
+    For each scene, consider:
+    - Visual setting and atmosphere
+    - Character presence and interactions
+    - Dramatic purpose and story progression
+    - Emotional impact and pacing
+    - Visual storytelling opportunities
+    - Scene transitions and flow
+    - Technical considerations (camera, lighting, staging)
+""")
+
+templates.register("dialogue", """
+    For this scene:
+    Setting: {setting}
+    Description: {description}
+    Mood: {mood}
+    Purpose: {purpose}
+
+    Generate natural dialogue between these characters:
+    {characters}
+
+    Consider:
+    - Each character's unique voice and personality
+    - Scene mood and emotional context
+    - Story progression and character arcs
+    - Subtext and dramatic tension
+    - Natural conversation flow
+    - Character relationships and dynamics
+""")
+
+templates.register("continuity", """
+    Analyze this script for continuity and consistency.
+
+    Check for:
+    - Plot coherence and logic
+    - Character consistency and arc progression
+    - Timeline and causality
+    - Setting and world-building consistency
+    - Dialogue and tone consistency
+    - Emotional throughlines
+    - Resolution of plot threads
+    - Thematic consistency
+
+    Provide:
+    - Identified issues
+    - Specific suggestions for improvement
+    - Potential plot holes or inconsistencies
+    - Character arc completion analysis
+""")
+
+templates.register("continuity_window", """
+    Analyze scenes {first} to {last} of this script for continuity and consistency
+    with each other, the plot and the characters.
+
+    Scenes:
+    {scenes}
+
+    Check for:
+    - Plot coherence and logic
+    - Character consistency within these scenes
+    - Timeline and causality
+    - Setting and world-building consistency
+    - Dialogue and tone consistency
+
+    Provide:
+    - Identified issues
+    - Specific suggestions for improvement
+    Refer to scenes by number (e.g. "scene {first}") in every point.
+""")
+
+templates.register("continuity_arcs", """
+    Analyze every character's arc across the whole script, using this scene outline:
+    {outline}
+
+    Check for:
+    - Character consistency and arc progression
+    - Emotional throughlines
+    - Resolution of plot threads
+    - Thematic consistency
+
+    Provide:
+    - Identified issues
+    - Specific suggestions for improvement
+    - Character arc completion analysis
+    Refer to scenes by number (e.g. "scene 3") wherever a point concerns specific scenes.
+""")
+
+templates.register("repair", """
+    Your previous answer to this request was missing some required parts.
+
+    Previous answer:
+    {previous}
+
+    Provide only the following, in exactly this format:
+    {instructions}
+""")
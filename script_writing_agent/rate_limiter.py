@@ -0,0 +1,245 @@
+"""Adaptive rate limiting and concurrency control for model calls.
+
+Every call goes through a per-model token bucket for requests/min and
+tokens/min and a cap on in-flight calls. Quota errors are retried with
+exponential backoff and jitter, and they also halve the request rate,
+which then recovers a little after each success.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Check whether an exception is a provider quota / rate limit error."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+class TokenBucket:
+    """Continuously refilling token bucket, measured per minute."""
+
+    def __init__(self, per_minute: float):
+        """Initialize the bucket full.
+
+        Args:
+            per_minute (float): Refill rate and capacity
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Take tokens out of the bucket; the balance may go negative."""
+        self._refill()
+        self.tokens -= amount
+
+
+class _ModelLimits:
+    """Request and token buckets for one model, with an adaptive request rate."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.max_rpm = requests_per_minute
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    @property
+    def current_rpm(self) -> float:
+        return self.requests.rate * 60.0
+
+    def throttle(self) -> None:
+        """Halve the request rate after a quota error."""
+        self.requests.rate = max(self.requests.rate / 2, 1 / 60.0)
+
+    def recover(self) -> None:
+        """Raise the request rate by one request/min after a success."""
+        self.requests.rate = min(self.requests.rate + 1 / 60.0, self.max_rpm / 60.0)
+
+
+class RateGovernor:
+    """Shared async governor for all model calls."""
+
+    def __init__(self, requests_per_minute: float = 60, tokens_per_minute: float = 1_000_000,
+                 max_in_flight: int = 8, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0):
+        """Initialize the governor.
+
+        Args:
+            requests_per_minute (float): Request budget per model
+            tokens_per_minute (float): Token budget per model
+            max_in_flight (int): Maximum concurrent model calls
+            max_retries (int): Retries on quota errors before giving up
+            backoff_base (float): First backoff delay in seconds
+            backoff_max (float): Upper bound of a single backoff delay
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._models: Dict[str, _ModelLimits] = {}
+        # Semaphores bind to an event loop, so keep one per running loop
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.stats = {
+            "requests": 0,
+            "in_flight": 0,
+            "queued": 0,
+            "max_queued": 0,
+            "throttled_waits": 0,
+            "quota_errors": 0,
+            "retries": 0,
+            "failures": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "RateGovernor":
+        """Create a governor configured from GEMINI_* environment variables."""
+        return cls(
+            requests_per_minute=float(os.getenv("GEMINI_RPM", "60")),
+            tokens_per_minute=float(os.getenv("GEMINI_TPM", "1000000")),
+            max_in_flight=int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8")),
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4")),
+            backoff_base=float(os.getenv("GEMINI_BACKOFF_BASE", "1.0")),
+            backoff_max=float(os.getenv("GEMINI_BACKOFF_MAX", "30")),
+        )
+
+    def _limits(self, model_name: str) -> _ModelLimits:
+        if model_name not in self._models:
+            self._models[model_name] = _ModelLimits(self.requests_per_minute, self.tokens_per_minute)
+        return self._models[model_name]
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _acquire_budget(self, limits: _ModelLimits, tokens: int) -> None:
+        """Wait until both buckets can cover one request of `tokens` tokens."""
+        while True:
+            delay = max(limits.requests.delay_for(1), limits.tokens.delay_for(tokens))
+            if delay <= 0:
+                limits.requests.consume(1)
+                limits.tokens.consume(tokens)
+                return
+            self.stats["throttled_waits"] += 1
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for a retry attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def run(self, model_name: str, call: Callable[[], Awaitable[Any]],
+                  estimated_tokens: int = 1, call_stats: Optional[Dict[str, int]] = None) -> Any:
+        """Run a model call within the rate and concurrency limits.
+
+        Args:
+            model_name (str): Model the call is billed against
+            call (Callable): Zero-argument coroutine factory performing the call
+            estimated_tokens (int): Tokens reserved before the call is made
+            call_stats (Dict, optional): Receives the number of retries under "retries"
+
+        Returns:
+            Any: Result of the call
+
+        Raises:
+            Exception: The last error once retries are exhausted, or any
+                non-quota error immediately
+        """
+        limits = self._limits(model_name)
+        self.stats["requests"] += 1
+        attempt = 0
+        while True:
+            semaphore = self._semaphore()
+            self.stats["queued"] += 1
+            self.stats["max_queued"] = max(self.stats["max_queued"], self.stats["queued"])
+            try:
+                await semaphore.acquire()
+            finally:
+                self.stats["queued"] -= 1
+
+            try:
+                await self._acquire_budget(limits, estimated_tokens)
+                self.stats["in_flight"] += 1
+                try:
+                    result = await call()
+                finally:
+                    self.stats["in_flight"] -= 1
+            except Exception as e:
+                if not is_quota_error(e):
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["quota_errors"] += 1
+                limits.throttle()
+                if attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.stats["retries"] += 1
+                if call_stats is not None:
+                    call_stats["retries"] = attempt
+                logger.warning(
+                    f"Quota error from {model_name}, retry {attempt}/{self.max_retries} "
+                    f"in {delay:.2f}s (rate now {limits.current_rpm:.1f} rpm)"
+                )
+            else:
+                limits.recover()
+                self._charge_actual_usage(limits, result, estimated_tokens)
+                return result
+            finally:
+                semaphore.release()
+
+            # Back off outside the semaphore so other calls can proceed
+            await asyncio.sleep(delay)
+
+    def _charge_actual_usage(self, limits: _ModelLimits, result: Any, estimated_tokens: int) -> None:
+        """Correct the token bucket with the usage reported by the provider."""
+        total = getattr(result, "total_tokens", None)
+        if isinstance(total, int) and total > estimated_tokens:
+            limits.tokens.consume(total - estimated_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue-depth and retry counters plus current per-model rates."""
+        stats = dict(self.stats)
+        stats["models"] = {
+            name: {
+                "requests_per_minute": round(limits.current_rpm, 2),
+                "request_tokens_available": round(limits.requests.tokens, 2),
+                "tokens_available": round(limits.tokens.tokens, 2),
+            }
+            for name, limits in self._models.items()
+        }
+        return stats
@@ -0,0 +1,314 @@
+"""Two-tier response cache for AI model calls.
+
+Responses are keyed on a stable hash of the model name, the full prompt,
+the normalized request context and the generation config. Lookups hit an
+in-process LRU first and fall back to a SQLite file that survives restarts.
+The disk tier holds a bounded number of rows: expired and oldest rows are
+deleted periodically as entries are stored. Async callers use `get_async`
+and `set_async`, which touch SQLite in a worker thread.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Name used for requests that carry no request_type (the conversational path)
+CONVERSATIONAL = "conversational"
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "promptplay", "responses.sqlite3"
+)
+
+
+def _normalize(value: Any) -> Any:
+    """Convert a context value into a JSON-stable structure."""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(v) for v in value), key=repr)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def make_cache_key(model_name: str, prompt: str,
+                   context: Optional[Dict[str, Any]] = None,
+                   generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Build a content-addressed key for a model request.
+
+    Args:
+        model_name (str): Fully qualified model name
+        prompt (str): The full prompt sent to the model
+        context (Dict, optional): Request context
+        generation_config (Dict, optional): Model generation settings
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps(
+        {
+            "model": model_name,
+            "prompt": prompt,
+            "context": _normalize(context or {}),
+            "config": _normalize(generation_config or {}),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + SQLite cache for raw model response text."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 24 * 3600,
+                 path: Optional[str] = DEFAULT_CACHE_PATH,
+                 disabled_types: Optional[Iterable[str]] = None,
+                 enabled: bool = True, max_disk_entries: int = 10000,
+                 purge_interval_seconds: float = 3600.0):
+        """Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum entries held in memory
+            ttl_seconds (float): Lifetime of an entry in either tier
+            path (str, optional): SQLite file for the disk tier, None to disable it
+            disabled_types (Iterable[str], optional): request_types never cached
+            enabled (bool): Master switch for the whole cache
+            max_disk_entries (int): Rows kept in the disk tier, oldest deleted first
+            purge_interval_seconds (float): Maximum time between purges of the disk tier
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.enabled = enabled
+        self.disabled_types = set(disabled_types or [])
+        self.max_disk_entries = max_disk_entries
+        self.purge_interval_seconds = purge_interval_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the SQLite connection separately, so memory lookups on the
+        # event loop never wait for disk I/O running in a worker thread
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_failed = False
+        self._last_purge = time.monotonic()
+        self._stores_since_purge = 0
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "skipped": 0,
+            "disk_purged": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Create a cache configured from RESPONSE_CACHE_* environment variables."""
+        path = os.getenv("RESPONSE_CACHE_PATH", DEFAULT_CACHE_PATH)
+        disabled = os.getenv("RESPONSE_CACHE_DISABLED_TYPES", "")
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600))),
+            path=path or None,
+            disabled_types=[t.strip() for t in disabled.split(",") if t.strip()],
+            enabled=os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no"),
+            max_disk_entries=int(os.getenv("RESPONSE_CACHE_DISK_SIZE", "10000")),
+            purge_interval_seconds=float(os.getenv("RESPONSE_CACHE_PURGE_INTERVAL", "3600")),
+        )
+
+    def is_enabled_for(self, request_type: Optional[str]) -> bool:
+        """Check whether responses for a request type may be cached."""
+        return self.enabled and (request_type or CONVERSATIONAL) not in self.disabled_types
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the disk tier lazily; disable it for good if that fails."""
+        if self._db is not None or self._db_failed or not self.path:
+            return self._db
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            db.commit()
+            self._db = db
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Disk response cache unavailable ({self.path}): {str(e)}")
+            self._db_failed = True
+        return self._db
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text for a key, or None on a miss."""
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        return self._get_disk(key)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """Like `get`, reading the disk tier in a worker thread."""
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if not self.path or self._db_failed:
+            return self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def set(self, key: str, value: str) -> None:
+        """Store response text under a key in both tiers."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+            self.stats["stores"] += 1
+        self._set_disk(key, value, created)
+
+    async def set_async(self, key: str, value: str) -> None:
+        """Like `set`, writing the disk tier in a worker thread."""
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+            self.stats["stores"] += 1
+        if self.path and not self._db_failed:
+            await asyncio.to_thread(self._set_disk, key, value, created)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if time.time() - created <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        """Look a key up in the disk tier, promoting a hit to memory."""
+        with self._db_lock:
+            db = self._connect()
+            if db is not None:
+                try:
+                    row = db.execute(
+                        "SELECT value, created FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        value, created = row
+                        if time.time() - created <= self.ttl_seconds:
+                            with self._lock:
+                                self._remember(key, value, created)
+                                self.stats["disk_hits"] += 1
+                            return value
+                        db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Error reading response cache: {str(e)}")
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _set_disk(self, key: str, value: str, created: float) -> None:
+        """Write a row to the disk tier, purging it when it is due."""
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, created),
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Error writing response cache: {str(e)}")
+                return
+            self._stores_since_purge += 1
+            # Trim often enough that the table stays within ~10% of its bound
+            due = (self._stores_since_purge >= max(1, self.max_disk_entries // 10)
+                   or time.monotonic() - self._last_purge >= self.purge_interval_seconds)
+            if due:
+                self._purge_disk(db, time.time() - self.ttl_seconds)
+
+    def _purge_disk(self, db: sqlite3.Connection, cutoff: float) -> int:
+        """Delete expired rows and the oldest rows beyond `max_disk_entries`."""
+        self._last_purge = time.monotonic()
+        self._stores_since_purge = 0
+        try:
+            removed = db.execute("DELETE FROM responses WHERE created < ?", (cutoff,)).rowcount
+            removed += db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (max(0, self.max_disk_entries),),
+            ).rowcount
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Error purging response cache: {str(e)}")
+            return 0
+        if removed:
+            logger.debug(f"Purged {removed} response cache rows")
+            with self._lock:
+                self.stats["disk_purged"] += removed
+        return removed
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        """Insert into the memory tier and evict least recently used entries."""
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def record_skip(self) -> None:
+        """Count a request that bypassed the cache because of an opt-out."""
+        with self._lock:
+            self.stats["skipped"] += 1
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers and trim the disk tier to its bound.
+
+        Returns:
+            int: Number of disk entries removed
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for key in [k for k, (_, created) in self._memory.items() if created < cutoff]:
+                del self._memory[key]
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return 0
+            return self._purge_disk(db, cutoff)
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current tier sizes."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
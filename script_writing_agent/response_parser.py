@@ -0,0 +1,262 @@
+"""Single-pass structuring of raw model responses.
+
+Each request type is parsed by one traversal over the response lines that
+fills every field at once. Lines are only lowercased or pattern-matched
+when a cheap check says they might be relevant, so large responses
+(feature-length scripts) parse in linear time.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+THEME_INDICATORS = ("key themes:", "thematic elements:", "themes:", "theme:")
+TONE_INDICATORS = ("tone:", "mood:", "atmosphere:")
+
+# Values parse_plot falls back to when the response lacks a field
+DEFAULT_THEMES = ["No explicit themes identified"]
+DEFAULT_TONE = "Neutral"
+
+# "scene 3", "scenes 2-4", "Scenes 5 and 7"
+_SCENE_REF_RE = re.compile(r"\bscenes?\s*#?\s*(\d+(?:\s*(?:-|–|to|and|&|,)\s*\d+)*)", re.IGNORECASE)
+_SCENE_RANGE_RE = re.compile(r"(\d+)\s*(?:-|–|to)\s*(\d+)|(\d+)")
+
+# Words marking a continuity heading as introducing suggestions rather than issues
+SUGGESTION_HEADINGS = ("suggest", "improv", "recommend", "fix")
+
+_ACT_RE = re.compile(r"^act\b\s*[:\-.]?\s*(.*)$", re.IGNORECASE)
+_BULLET_RE = re.compile(r"^(?:[#>*\-•]+|\d+[.)])\s*")
+
+# Longest plausible "Name:" prefix for a character or dialogue line
+MAX_NAME_WORDS = 6
+
+# First characters of lines that may carry a bullet or heading marker
+_MARKUP_START = frozenset("#>*-•0123456789")
+
+
+def _clean(line: str) -> str:
+    """Strip whitespace, markdown emphasis and list bullets from a line."""
+    line = line.strip()
+    if line and (line[0] in _MARKUP_START or "**" in line or "__" in line):
+        line = _BULLET_RE.sub("", line.replace("**", "").replace("__", ""), count=1).strip()
+    return line
+
+
+def _lines(text: str):
+    """Yield the non-empty lines of a text with markdown bullets/emphasis removed."""
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # Most lines carry no markup; only those that might go through the regex
+        if line[0] in _MARKUP_START or "**" in line or "__" in line:
+            line = _BULLET_RE.sub("", line.replace("**", "").replace("__", ""), count=1).strip()
+            if not line:
+                continue
+        yield line
+
+
+def _split_label(line: str) -> Optional[tuple]:
+    """Split "Label: value" when the label looks like a name, else None."""
+    label, sep, value = line.partition(":")
+    if not sep:
+        return None
+    label = label.strip()
+    if not label or label.count(" ") >= MAX_NAME_WORDS:
+        return None
+    return label, value.strip()
+
+
+def _find_indicator(lowered: str, indicators: tuple) -> Optional[tuple]:
+    for indicator in indicators:
+        index = lowered.find(indicator)
+        if index != -1:
+            return indicator, index + len(indicator)
+    return None
+
+
+def parse_plot(text: str) -> Dict[str, Any]:
+    """Parse acts, themes and tone in one pass."""
+    acts: Dict[str, List[str]] = {}
+    themes: List[str] = []
+    tone_by_indicator: Dict[str, str] = {}
+    current_act = None
+
+    for line in _lines(text):
+        if ":" in line:
+            lowered = line.lower()
+            found = _find_indicator(lowered, THEME_INDICATORS)
+            if found is not None:
+                for theme in lowered[found[1]:].split(","):
+                    theme = theme.strip().rstrip(".")
+                    if theme and theme not in themes:
+                        themes.append(theme)
+                continue
+            found = _find_indicator(lowered, TONE_INDICATORS)
+            if found is not None:
+                tone_by_indicator.setdefault(found[0], lowered[found[1]:].strip())
+                continue
+
+        if line[:3].lower() == "act":
+            match = _ACT_RE.match(line)
+            if match is not None:
+                current_act = line.lower()[3:].strip(" :-.") or str(len(acts) + 1)
+                acts.setdefault(current_act, [])
+                continue
+
+        if current_act is not None:
+            acts[current_act].append(line)
+
+    tone = next((tone_by_indicator[i] for i in TONE_INDICATORS if i in tone_by_indicator), None)
+    return {
+        "structure": "dynamic",  # Let AI determine the structure
+        "acts": {k: " ".join(v) for k, v in acts.items()} or {"setup": text},
+        "themes": themes or list(DEFAULT_THEMES),
+        "tone": tone or DEFAULT_TONE,
+    }
+
+
+def parse_characters(text: str) -> Dict[str, Any]:
+    """Parse main and supporting characters in one pass.
+
+    "Main"/"Supporting" section headings assign roles; without them the
+    first character is the protagonist and the rest are supporting.
+    """
+    main: List[Dict[str, str]] = []
+    supporting: List[Dict[str, str]] = []
+    section = None
+    current = None
+
+    for line in _lines(text):
+        split = _split_label(line)
+        label_lower = (split[0] if split else line).lower()
+        if "character" in label_lower or "cast" in label_lower or "antagonist" in label_lower:
+            if (split is None or not split[1]) and len(label_lower.split()) <= 4:
+                if "support" in label_lower or "secondary" in label_lower:
+                    section = "supporting"
+                elif "main" in label_lower or "lead" in label_lower or "primary" in label_lower:
+                    section = "main"
+                elif "antagonist" in label_lower:
+                    section = "main"
+                current = None
+                continue
+
+        if split is not None:
+            name, description = split
+            if section == "supporting" or (section is None and main):
+                current = {"name": name, "description": description, "role": "Supporting"}
+                supporting.append(current)
+            else:
+                current = {"name": name, "description": description, "role": "Protagonist"}
+                main.append(current)
+        elif current is not None:
+            current["description"] = f"{current['description']} {line}".strip()
+
+    return {
+        "main_characters": main,
+        "supporting_characters": supporting,
+    }
+
+
+def parse_scenes(text: str) -> Dict[str, Any]:
+    """Parse scene headings, settings and descriptions in one pass."""
+    scenes: List[Dict[str, str]] = []
+    description: List[str] = []
+    current = None
+
+    for line in _lines(text):
+        if line[:5].upper() == "SCENE":
+            if current is not None:
+                current["description"] = " ".join(description)
+            current = {"id": f"scene_{len(scenes) + 1}", "setting": "", "description": ""}
+            scenes.append(current)
+            description = []
+            # "SCENE 3: INT. LAB - NIGHT" carries its setting on the heading line
+            _, sep, rest = line.partition(":")
+            if sep and rest.strip():
+                current["setting"] = rest.strip()
+            continue
+        if current is None:
+            continue
+        if not current["setting"]:
+            current["setting"] = line
+        else:
+            description.append(line)
+
+    if current is not None:
+        current["description"] = " ".join(description)
+    return {"scenes": scenes}
+
+
+def parse_dialogue(text: str) -> Dict[str, Any]:
+    """Parse "CHARACTER: line" exchanges in one pass."""
+    exchanges = []
+    for raw in text.splitlines():
+        if ":" not in raw:
+            continue
+        split = _split_label(_clean(raw))
+        if split is not None and split[1]:
+            exchanges.append({"character": split[0], "line": split[1]})
+    return {"exchanges": exchanges}
+
+
+def scene_refs(text: str) -> List[str]:
+    """Scene IDs ("scene_3") referenced in a text, in order and without duplicates."""
+    refs: List[str] = []
+    if "scene" not in text.lower():
+        return refs
+    for match in _SCENE_REF_RE.finditer(text):
+        for first, last, single in _SCENE_RANGE_RE.findall(match.group(1)):
+            if single:
+                numbers = [int(single)]
+            else:
+                low, high = sorted((int(first), int(last)))
+                numbers = list(range(low, min(high, low + 50) + 1))
+            for number in numbers:
+                ref = f"scene_{number}"
+                if ref not in refs:
+                    refs.append(ref)
+    return refs
+
+
+def parse_continuity(text: str) -> Dict[str, Any]:
+    """Parse continuity findings into issues and suggestions with scene references.
+
+    Headings ("Identified issues:", "Suggestions:") switch the list the
+    following lines go to; lines before any heading count as issues.
+    """
+    findings: Dict[str, List[Dict[str, Any]]] = {"issues": [], "suggestions": []}
+    kind = "issues"
+    for line in _lines(text):
+        if line.endswith(":") and line.count(" ") < MAX_NAME_WORDS:
+            lowered = line.lower()
+            kind = "suggestions" if any(word in lowered for word in SUGGESTION_HEADINGS) else "issues"
+            continue
+        findings[kind].append({"text": line, "scenes": scene_refs(line)})
+    return findings
+
+
+PARSERS = {
+    "plot_creation": parse_plot,
+    "character_creation": parse_characters,
+    "scene_creation": parse_scenes,
+    "dialogue_generation": parse_dialogue,
+    "continuity_check": parse_continuity,
+}
+
+
+def parse_response(text: str, request_type: Optional[str]) -> Dict[str, Any]:
+    """Structure a raw response for its request type.
+
+    Args:
+        text (str): Raw response from the AI model
+        request_type (str, optional): Type of the request
+
+    Returns:
+        Dict: Structured fields, or the raw text for unknown request types
+    """
+    parser = PARSERS.get(request_type or "")
+    if parser is None:
+        return {
+            "raw_response": text,
+            "structured": False
+        }
+    return parser(text)
@@ -0,0 +1,96 @@
+"""Validation and targeted repair of structured responses.
+
+`find_problems` lists the fields of a structured response that are missing
+or only hold the parser's fallback value. Instead of regenerating the whole
+response, the AI service asks the model for just those fields
+(`build_repair_prompt`) and merges them in (`merge_fields`).
+"""
+from typing import Any, Dict, List, Optional
+
+from .prompt_templates import templates
+from .response_parser import DEFAULT_THEMES, DEFAULT_TONE
+
+# Longest part of the previous answer quoted in a repair prompt
+PREVIOUS_ANSWER_CHARS = 1500
+
+# Format the model is asked to use for each repairable field
+REPAIR_INSTRUCTIONS = {
+    "plot_creation": {
+        "acts": 'The acts of the plot, each starting on its own line with "ACT <number> - <title>" '
+                "followed by what happens in it.",
+        "themes": 'One line starting with "Themes:" followed by the key themes, comma-separated.',
+        "tone": 'One line starting with "Tone:" followed by the overall tone.',
+    },
+    "character_creation": {
+        "main_characters": 'A line "Main characters:" followed by one line per main character '
+                           'in the form "Name: description".',
+    },
+    "scene_creation": {
+        "scenes": 'The scenes in order, each starting with a line "SCENE <number>: <setting>" '
+                  "followed by a description of what happens.",
+    },
+    "dialogue_generation": {
+        "exchanges": 'The dialogue, one line per exchange in the form "NAME: line".',
+    },
+}
+
+
+def find_problems(content: Any, request_type: Optional[str]) -> List[str]:
+    """Return the repairable fields of a structured response that are missing or malformed.
+
+    Args:
+        content (Any): Structured response (or the error dict from structuring)
+        request_type (str, optional): Type of the request
+
+    Returns:
+        List[str]: Field names, in a stable order; empty if the response is valid
+            or the request type has no required fields
+    """
+    fields = REPAIR_INSTRUCTIONS.get(request_type or "")
+    if not fields:
+        return []
+    if not isinstance(content, dict):
+        return list(fields)
+
+    problems = []
+    for field in fields:
+        value = content.get(field)
+        if field == "acts":
+            # The parser falls back to {"setup": <whole response>} without act headings
+            bad = not isinstance(value, dict) or not value or list(value) == ["setup"]
+        elif field == "themes":
+            bad = not isinstance(value, list) or not value or value == DEFAULT_THEMES
+        elif field == "tone":
+            bad = not isinstance(value, str) or not value or value == DEFAULT_TONE
+        else:
+            bad = not isinstance(value, list) or not value
+        if bad:
+            problems.append(field)
+    return problems
+
+
+def build_repair_prompt(previous_answer: str, fields: List[str], request_type: str) -> str:
+    """Prompt asking only for the given fields, quoting the previous answer."""
+    instructions = REPAIR_INSTRUCTIONS[request_type]
+    previous = previous_answer.strip()
+    if len(previous) > PREVIOUS_ANSWER_CHARS:
+        previous = previous[:PREVIOUS_ANSWER_CHARS] + " ..."
+    return templates.render(
+        "repair",
+        previous=previous or "(empty)",
+        instructions="\n".join(f"- {instructions[field]}" for field in fields),
+    )
+
+
+def merge_fields(content: Any, patch: Dict[str, Any], fields: List[str],
+                 request_type: str) -> Dict[str, Any]:
+    """Copy repaired fields from `patch` into `content`.
+
+    A structuring error is dropped once every required field is present.
+    """
+    merged = dict(content) if isinstance(content, dict) else {}
+    for field in fields:
+        merged[field] = patch[field]
+    if "error" in merged and not find_problems(merged, request_type):
+        merged.pop("error")
+    return merged
@@ -0,0 +1,156 @@
+"""Request-type-aware model routing with latency SLOs.
+
+Each request type maps to a model and generation config. When the recent
+p95 latency of a route's model breaches its SLO, requests are downgraded
+to the route's faster model; a small share keeps probing the primary
+model so the route switches back once it recovers.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .model_catalog import qualify_model_name
+from .response_cache import CONVERSATIONAL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "candidate_count": 1,
+}
+
+DEFAULT_FAST_MODEL = "gemini-2.0-flash-lite"
+
+
+@dataclass
+class Route:
+    """Model and settings used for one request type."""
+    model: Optional[str] = None  # None uses the backend's default model
+    generation_config: Dict[str, Any] = field(default_factory=lambda: dict(DEFAULT_GENERATION_CONFIG))
+    fast_model: Optional[str] = None  # Downgrade target when the SLO is breached
+    slo_p95_seconds: Optional[float] = None
+
+
+@dataclass
+class RouteChoice:
+    """Outcome of routing one request."""
+    model: str
+    generation_config: Dict[str, Any]
+    downgraded: bool = False
+
+
+def default_routes() -> Dict[str, Route]:
+    """Routing table used unless MODEL_ROUTES overrides it."""
+    fast_model = os.getenv("FAST_MODEL", DEFAULT_FAST_MODEL)
+    creative = dict(DEFAULT_GENERATION_CONFIG, temperature=0.8)
+    analytical = dict(DEFAULT_GENERATION_CONFIG, temperature=0.2)
+    return {
+        "plot_creation": Route(generation_config=creative, fast_model=fast_model, slo_p95_seconds=30.0),
+        "character_creation": Route(generation_config=creative, fast_model=fast_model, slo_p95_seconds=30.0),
+        "scene_creation": Route(fast_model=fast_model, slo_p95_seconds=30.0),
+        "dialogue_generation": Route(fast_model=fast_model, slo_p95_seconds=20.0),
+        # Consistency analysis does not need the creative model
+        "continuity_check": Route(model=fast_model, generation_config=analytical),
+        CONVERSATIONAL: Route(fast_model=fast_model, slo_p95_seconds=10.0),
+    }
+
+
+class ModelRouter:
+    """Chooses the model and generation config for each request type."""
+
+    def __init__(self, routes: Dict[str, Route],
+                 latency_p95: Callable[[str, str, int], Optional[Tuple[float, int]]],
+                 min_samples: int = 20, probe_every: int = 10):
+        """Initialize the router.
+
+        Args:
+            routes (Dict[str, Route]): Routing table keyed by request type
+            latency_p95 (Callable): Returns (p95 seconds, sample count) over the
+                last N calls of a (request_type, model, N), or None without data
+            min_samples (int): Calls needed before an SLO is enforced
+            probe_every (int): While downgraded, every Nth request still goes
+                to the primary model to measure whether it has recovered
+        """
+        self.routes = routes
+        self.latency_p95 = latency_p95
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self._downgraded: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, latency_p95: Callable[[str, str, int], Optional[Tuple[float, int]]]) -> "ModelRouter":
+        """Create a router from the defaults, overridden by MODEL_ROUTES (JSON).
+
+        MODEL_ROUTES maps request types to Route fields, e.g.
+        {"continuity_check": {"model": "gemini-2.0-flash", "slo_p95_seconds": 15}}.
+        """
+        routes = default_routes()
+        overrides = os.getenv("MODEL_ROUTES")
+        if overrides:
+            try:
+                for request_type, values in json.loads(overrides).items():
+                    base = routes.get(request_type, Route())
+                    config = dict(base.generation_config, **values.pop("generation_config", {}))
+                    routes[request_type] = Route(**dict(base.__dict__, generation_config=config, **values))
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Ignoring invalid MODEL_ROUTES: {str(e)}")
+        return cls(
+            routes,
+            latency_p95,
+            min_samples=int(os.getenv("ROUTE_SLO_MIN_SAMPLES", "20")),
+            probe_every=int(os.getenv("ROUTE_SLO_PROBE_EVERY", "10")),
+        )
+
+    def route_for(self, request_type: Optional[str]) -> Route:
+        return self.routes.get(request_type or CONVERSATIONAL) or Route()
+
+    def select(self, request_type: Optional[str], default_model: str) -> RouteChoice:
+        """Pick the model for a request.
+
+        Args:
+            request_type (str, optional): Type of the request
+            default_model (str): Backend default, used when a route names no model
+
+        Returns:
+            RouteChoice: Model, generation config and whether it was downgraded
+        """
+        key = request_type or CONVERSATIONAL
+        route = self.route_for(request_type)
+        primary = qualify_model_name(route.model) if route.model else default_model
+        if not route.fast_model or route.slo_p95_seconds is None:
+            return RouteChoice(primary, route.generation_config)
+
+        fast = qualify_model_name(route.fast_model)
+        if fast == primary:
+            return RouteChoice(primary, route.generation_config)
+
+        stats = self.latency_p95(key, primary, self.min_samples)
+        breached = (stats is not None and stats[1] >= self.min_samples
+                    and stats[0] > route.slo_p95_seconds)
+        with self._lock:
+            if not breached:
+                if key in self._downgraded:
+                    logger.info(f"Route {key} back within SLO, using {primary}")
+                    del self._downgraded[key]
+                return RouteChoice(primary, route.generation_config)
+
+            count = self._downgraded.get(key, 0)
+            if count == 0:
+                logger.warning(
+                    f"Route {key} p95 {stats[0]:.2f}s exceeds SLO {route.slo_p95_seconds:.2f}s, "
+                    f"downgrading to {fast}"
+                )
+            self._downgraded[key] = count + 1
+            if self.probe_every and count % self.probe_every == self.probe_every - 1:
+                return RouteChoice(primary, route.generation_config)
+            return RouteChoice(fast, route.generation_config, downgraded=True)
+
+    def downgraded_routes(self) -> Dict[str, int]:
+        """Request types currently downgraded, with requests routed since."""
+        with self._lock:
+            return dict(self._downgraded)
@@ -1,19 +1,28 @@
 """FastAPI server for the script writing agent."""
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import json
 import logging
 from contextlib import asynccontextmanager
 import time
 
 from script_writing_agent import (
     generate_script_async,
+    resume_script_async,
     ScriptRequest,
     ScriptResponse
 )
 from script_writing_agent.ai_service import ai_service
+from script_writing_agent.metrics import metrics
+from script_writing_agent.similarity_cache import similarity_cache
+from script_writing_agent.checkpoints import checkpoints
+from script_writing_agent.stage_graph import STAGE_COMPLETED, STAGE_FAILED
+from script_writing_agent.stage_memo import stage_memo
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -78,7 +87,7 @@ async def generate_script_endpoint(request: ScriptRequest, background_tasks: Bac
             if result.get("status") == "error":
                 raise HTTPException(
                     status_code=400,
-                    detail=result.get("message", "Unknown error in script generation")
+                    detail=_error_detail(result)
                 )
                   # Format response depending on request type
             if not request.parameters or not request.parameters.get("request_type"):
@@ -94,8 +103,10 @@ async def generate_script_endpoint(request: ScriptRequest, background_tasks: Bac
                 # For script generation
                 response_data = {
                     "script": result.get("script", {}),
-                    "status": "success",
-                    "message": result.get("message", "Script generated successfully")
+                    "status": result.get("status", "success"),
+                    "message": result.get("message", "Script generated successfully"),
+                    "job_id": result.get("job_id"),
+                    "failed_stages": result.get("failed_stages")
                 }
                 return ScriptResponse(**response_data)
 
@@ -109,6 +120,163 @@ async def generate_script_endpoint(request: ScriptRequest, background_tasks: Bac
                 detail=f"Internal server error: {str(e)}"
             )
 
+def _error_detail(result: Dict) -> str:
+    """Error message of a failed result, naming the job to resume if it was checkpointed."""
+    message = result.get("message", "Unknown error in script generation")
+    if result.get("job_id"):
+        message = f"{message} (resume with job_id {result['job_id']})"
+    return message
+
+@app.post("/api/scripts/{job_id}/resume")
+async def resume_script_endpoint(job_id: str):
+    """Continue a checkpointed script generation, skipping completed stages."""
+    async with track_request() as request_id:
+        logger.info(f"Request {request_id}: Resuming job {job_id}")
+        result = await resume_script_async(job_id)
+        if result.get("status") == "error":
+            raise HTTPException(status_code=400, detail=_error_detail(result))
+        return ScriptResponse(
+            script=result.get("script", {}),
+            status=result.get("status", "success"),
+            message=result.get("message", "Script generated successfully"),
+            job_id=result.get("job_id"),
+            failed_stages=result.get("failed_stages")
+        )
+
+def format_sse(event: str, data: Dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _stage_event(event: str, stage: str, detail: Any) -> Dict:
+    """Payload of a pipeline stage event."""
+    if event == STAGE_COMPLETED:
+        return {"stage": stage, "output": detail}
+    if event == STAGE_FAILED:
+        if isinstance(detail, dict):
+            error = detail.get("message") or detail.get("error_message") or detail.get("error")
+        else:
+            error = str(detail)
+        return {"stage": stage, "error": error or "Unknown error"}
+    return {"stage": stage}
+
+async def script_events(prompt: str, parameters: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """Run the script pipeline and yield (event, data) as its stages progress.
+
+    Yields `stage_started`, `stage_completed` (with the stage output) and
+    `stage_failed` events, then one `done` event with the overall status,
+    message and job ID. The generation is cancelled if the consumer stops.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_stage(event: str, stage: str, detail: Any) -> None:
+        queue.put_nowait((event, _stage_event(event, stage, detail)))
+
+    task = asyncio.create_task(generate_script_async(prompt, parameters, listener=on_stage))
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            break
+        # Events queued as the generation finished
+        while not queue.empty():
+            yield queue.get_nowait()
+        result = task.result()
+        script = result.get("script") or {}
+        yield "done", {
+            "status": result.get("status"),
+            "message": result.get("message"),
+            "job_id": result.get("job_id"),
+            "metadata": script.get("metadata")
+        }
+    finally:
+        if not task.done():
+            task.cancel()
+
+@app.post("/api/scripts/generate/events")
+async def generate_events_endpoint(request: ScriptRequest):
+    """Generate a full script, streaming stage progress as server-sent events.
+
+    Emits `stage_started`, `stage_completed` (with the stage payload) and
+    `stage_failed` events as stages progress, then `done`.
+    """
+    async def event_stream() -> AsyncIterator[str]:
+        async with track_request() as request_id:
+            logger.info(f"Request {request_id}: Streaming script for: {request.prompt[:100]}...")
+            start_time = time.time()
+            try:
+                async for event, data in script_events(request.prompt, request.parameters):
+                    yield format_sse(event, data)
+                logger.info(f"Request {request_id}: Script stream completed in {time.time() - start_time:.2f}s")
+            except Exception as e:
+                logger.error(f"Request {request_id}: Script stream error - {str(e)}")
+                yield format_sse("done", {"status": "error", "message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/scripts/generate")
+async def generate_script_websocket(websocket: WebSocket):
+    """Generate full scripts over a WebSocket.
+
+    The client sends `{"prompt": ..., "parameters": {...}}`; the server sends
+    `{"event": ..., "data": ...}` messages (the same events as the SSE
+    endpoint), ending each generation with `done`. Several prompts can be
+    sent over one connection, one after the other.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"event": "done",
+                                           "data": {"status": "error", "message": "Messages must be JSON"}})
+                continue
+            prompt = message.get("prompt") if isinstance(message, dict) else None
+            if not prompt:
+                await websocket.send_json({"event": "done",
+                                           "data": {"status": "error", "message": "A prompt is required"}})
+                continue
+            async with track_request() as request_id:
+                logger.info(f"Request {request_id}: WebSocket script for: {prompt[:100]}...")
+                async for event, data in script_events(prompt, message.get("parameters")):
+                    await websocket.send_text(json.dumps({"event": event, "data": data}, default=str))
+    except WebSocketDisconnect:
+        logger.info("Script WebSocket client disconnected")
+
+@app.post("/api/scripts/generate/stream")
+async def generate_stream_endpoint(request: ScriptRequest):
+    """Stream a conversational response as server-sent events.
+
+    Emits `chunk` events with text as it arrives, then `done`, or `error`
+    if generation fails part-way.
+    """
+    async def event_stream() -> AsyncIterator[str]:
+        async with track_request() as request_id:
+            logger.info(f"Request {request_id}: Streaming prompt: {request.prompt[:100]}...")
+            start_time = time.time()
+            try:
+                async for text in ai_service.generate_response_stream(request.prompt):
+                    yield format_sse("chunk", {"content": text})
+                yield format_sse("done", {"status": "success"})
+                logger.info(f"Request {request_id}: Stream completed in {time.time() - start_time:.2f}s")
+            except Exception as e:
+                logger.error(f"Request {request_id}: Stream error - {str(e)}")
+                yield format_sse("error", {"status": "error", "message": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 async def cleanup_request_resources(request_id: float):
     """Clean up any resources used by the request."""
     try:
@@ -125,6 +293,19 @@ async def health_check():
         "active_requests": len(active_requests)
     }
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Expose token, latency and cost metrics in Prometheus text format."""
+    ai_service.publish_stats()
+    metrics.set_gauges("similarity_cache", similarity_cache.get_stats())
+    metrics.set_gauges("stage_memo", stage_memo.get_stats())
+    metrics.set_gauges("checkpoints", checkpoints.get_stats())
+    metrics.set_gauges("server", {"active_requests": len(active_requests)})
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize resources on server startup."""
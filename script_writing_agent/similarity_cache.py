@@ -0,0 +1,223 @@
+"""Near-duplicate cache for concept-level stages (plot and characters).
+
+Concepts are normalized (case, punctuation, filler words) into a set of
+word features. A MinHash signature of those features is split into bands
+that index the entry (locality-sensitive hashing), so a lookup only
+compares against entries sharing at least one band. A candidate is served
+when the Jaccard similarity of its features reaches the threshold.
+"""
+import copy
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that do not change what a concept is about
+STOPWORDS = frozenset(
+    "a an the and or of in on at to for from with about into set story tale "
+    "where who whom which that this is are be film movie script".split()
+)
+
+_PRIME = (1 << 61) - 1
+
+
+def normalize_concept(concept: str) -> str:
+    """Lowercase a concept and strip punctuation and filler words."""
+    tokens = _TOKEN_RE.findall(concept.lower())
+    meaningful = [t for t in tokens if t not in STOPWORDS]
+    return " ".join(meaningful or tokens)
+
+
+def _features(normalized: str) -> FrozenSet[str]:
+    return frozenset(normalized.split())
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures from a fixed family of universal hash functions."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, features: FrozenSet[str]) -> Tuple[int, ...]:
+        hashes = [int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big")
+                  for f in features] or [0]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self.params)
+
+
+class _Entry:
+    """A stored stage result and its similarity features."""
+
+    def __init__(self, namespace: Tuple[str, str], concept: str, normalized: str,
+                 features: FrozenSet[str], bands: List[Tuple], result: Dict[str, Any]):
+        self.namespace = namespace
+        self.concept = concept
+        self.normalized = normalized
+        self.features = features
+        self.bands = bands
+        self.result = result
+        self.stored_at = time.time()
+
+
+class SimilarityCache:
+    """In-memory LSH index of stage results keyed by concept similarity."""
+
+    def __init__(self, threshold: float = 0.75, max_entries: int = 1000,
+                 ttl_seconds: float = 24 * 3600, num_perm: int = 64, bands: int = 16,
+                 enabled: bool = False):
+        """Initialize the cache.
+
+        Args:
+            threshold (float): Minimum Jaccard similarity of normalized concepts
+                for a stored result to be served
+            max_entries (int): Maximum entries kept (least recently used are evicted)
+            ttl_seconds (float): Lifetime of an entry
+            num_perm (int): MinHash signature length
+            bands (int): LSH bands the signature is split into (must divide num_perm)
+            enabled (bool): Whether lookups and stores do anything
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.enabled = enabled
+        self._hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[Tuple[Tuple[str, str], str], _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, Set[Tuple[Tuple[str, str], str]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "SimilarityCache":
+        """Create a cache configured by SIMILARITY_CACHE_* environment variables."""
+        return cls(
+            threshold=float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.75")),
+            max_entries=int(os.getenv("SIMILARITY_CACHE_SIZE", "1000")),
+            ttl_seconds=float(os.getenv("SIMILARITY_CACHE_TTL", str(24 * 3600))),
+            enabled=os.getenv("SIMILARITY_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"),
+        )
+
+    def _index(self, request_type: str, concept: str, genre: Optional[str]):
+        namespace = (request_type, (genre or "").strip().lower())
+        normalized = normalize_concept(concept)
+        features = _features(normalized)
+        signature = self._hasher.signature(features)
+        bands = [(namespace, i, signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+        return namespace, normalized, features, bands
+
+    def lookup(self, request_type: str, concept: str, genre: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return a stored result for a similar concept, or None.
+
+        The returned result is a copy whose metadata carries the new concept,
+        `near_hit: True`, the similarity and the concept it was generated for.
+
+        Args:
+            request_type (str): Stage request type, e.g. "plot_creation"
+            concept (str): Story concept of the request
+            genre (str, optional): Genre; only results for the same genre match
+        """
+        if not self.enabled:
+            return None
+        namespace, normalized, features, bands = self._index(request_type, concept, genre)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for band in bands:
+                candidates |= self._buckets.get(band, set())
+            best, best_score = None, 0.0
+            for key in candidates:
+                entry = self._entries[key]
+                if now - entry.stored_at > self.ttl_seconds:
+                    self._remove(key)
+                    continue
+                score = _jaccard(features, entry.features)
+                if score > best_score:
+                    best, best_score = entry, score
+            if best is None or best_score < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end((best.namespace, best.normalized))
+            self.stats["exact_hits" if best.normalized == normalized else "near_hits"] += 1
+            result = copy.deepcopy(best.result)
+            matched_concept = best.concept
+
+        logger.info(f"Serving {request_type} for \"{concept[:60]}\" from similar concept "
+                    f"\"{matched_concept[:60]}\" (similarity {best_score:.2f})")
+        result["metadata"] = dict(
+            result.get("metadata") or {},
+            concept=concept,
+            near_hit=True,
+            similarity=round(best_score, 3),
+            matched_concept=matched_concept,
+        )
+        return result
+
+    def store(self, request_type: str, concept: str, genre: Optional[str], result: Dict[str, Any]) -> None:
+        """Index a successful stage result under its concept."""
+        if not self.enabled or result.get("status") != "success":
+            return
+        namespace, normalized, features, bands = self._index(request_type, concept, genre)
+        key = (namespace, normalized)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(namespace, concept, normalized, features, bands,
+                                        copy.deepcopy(result))
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _remove(self, key: Tuple[Tuple[str, str], str]) -> None:
+        entry = self._entries.pop(key)
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["exact_hits"] + self.stats["near_hits"] + self.stats["misses"]
+            hits = self.stats["exact_hits"] + self.stats["near_hits"]
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            )
+
+
+# Shared by the plot and character stages
+similarity_cache = SimilarityCache.from_env()
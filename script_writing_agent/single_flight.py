@@ -0,0 +1,90 @@
+"""Single-flight coalescing of identical concurrent requests.
+
+Concurrent callers with the same key share one underlying task instead of
+each issuing its own model call. A caller that is cancelled only stops
+waiting; the shared task is cancelled once no caller is left waiting.
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """A shared task and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates in-flight async work by key."""
+
+    def __init__(self):
+        # Tasks belong to an event loop, so flights are tracked per loop
+        self._flights: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "abandoned": 0,
+        }
+
+    def _loop_flights(self) -> Dict[str, _Flight]:
+        loop = asyncio.get_running_loop()
+        flights = self._flights.get(loop)
+        if flights is None:
+            flights = {}
+            self._flights[loop] = flights
+        return flights
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being worked on in this loop."""
+        try:
+            return len(self._loop_flights())
+        except RuntimeError:
+            return 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `factory()` once per key for all concurrent callers.
+
+        Args:
+            key (str): Identity of the request
+            factory (Callable): Zero-argument coroutine factory doing the work
+
+        Returns:
+            Any: Result of the shared task (its exception is re-raised to every caller)
+        """
+        flights = self._loop_flights()
+        flight = flights.get(key)
+        if flight is None or flight.task.cancelled():
+            flight = _Flight(asyncio.ensure_future(factory()))
+            flights[key] = flight
+            self.stats["leaders"] += 1
+
+            def _forget(_task, key=key, flight=flight):
+                if flights.get(key) is flight:
+                    del flights[key]
+
+            flight.task.add_done_callback(_forget)
+        else:
+            self.stats["coalesced"] += 1
+            logger.info(f"Coalescing request {key[:12]} with an in-flight call")
+
+        flight.waiters += 1
+        try:
+            # Shield so one waiter's cancellation does not cancel the others
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self.stats["abandoned"] += 1
+                # Forget the flight first, so a caller arriving before the
+                # task finishes cancelling starts a new one instead of joining it
+                if flights.get(key) is flight:
+                    del flights[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
@@ -0,0 +1,221 @@
+"""Declarative dependency graph of pipeline stages.
+
+Each stage names the values it reads and the value it produces. The graph
+starts every stage as soon as the values it reads are available, so
+independent stages overlap without hand-written gathers. A global limit
+bounds how many stages run at once, and every stage run is timed through
+the metrics registry. With a memo, a stage whose inputs hash to an
+earlier run reuses that run's output instead of executing. A listener is
+told when each stage starts, completes (with its output) or fails.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import metrics
+from .stage_memo import StageMemo
+
+logger = logging.getLogger(__name__)
+
+# Stage events passed to a run listener as (event, stage name, output or error)
+STAGE_STARTED = "stage_started"
+STAGE_COMPLETED = "stage_completed"
+STAGE_FAILED = "stage_failed"
+
+StageListener = Callable[[str, str, Any], None]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One pipeline step.
+
+    `func` is called with the values named by `inputs`, in order, and its
+    result is stored under `output` (the stage name unless given).
+    """
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    inputs: Tuple[str, ...] = ()
+    output: Optional[str] = None
+
+    @property
+    def produces(self) -> str:
+        return self.output or self.name
+
+
+class StageFailedError(Exception):
+    """Raised when a stage of a graph run fails."""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage {stage} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class StageGraph:
+    """Runs stages in dependency order with bounded concurrency."""
+
+    def __init__(self, stages: Iterable[Stage], max_concurrency: Optional[int] = None):
+        """Validate the graph.
+
+        Args:
+            stages (Iterable[Stage]): Stages in any order
+            max_concurrency (int, optional): Stages allowed to run at once;
+                defaults to the PIPELINE_MAX_CONCURRENCY environment variable
+
+        Raises:
+            ValueError: If two stages produce the same value or the stages form a cycle
+        """
+        self.stages: Dict[str, Stage] = {}
+        self._producers: Dict[str, str] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage {stage.name}")
+            if stage.produces in self._producers:
+                raise ValueError(f"Stages {self._producers[stage.produces]} and {stage.name} "
+                                 f"both produce {stage.produces}")
+            self.stages[stage.name] = stage
+            self._producers[stage.produces] = stage.name
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "4"))
+        self.max_concurrency = max(1, max_concurrency)
+        self.order = self._topological_order()
+
+    def dependencies(self, name: str) -> List[str]:
+        """Names of the stages whose outputs a stage reads."""
+        return [self._producers[value] for value in self.stages[name].inputs if value in self._producers]
+
+    def external_inputs(self) -> List[str]:
+        """Values that no stage produces and must be supplied to `run`."""
+        return sorted({value for stage in self.stages.values() for value in stage.inputs
+                       if value not in self._producers})
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+        def visit(name: str, path: List[str]) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Stage cycle: {' -> '.join(path + [name])}")
+            state[name] = 1
+            for dependency in self.dependencies(name):
+                visit(dependency, path + [name])
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    @staticmethod
+    def memoizable(output: Any) -> bool:
+        """Whether an output is complete enough to be reused (not an error or partial result)."""
+        return not (isinstance(output, dict) and output.get("status") in ("error", "partial"))
+
+    def remember(self, values: Dict[str, Any], memo: StageMemo) -> None:
+        """Memoize the stage outputs in `values` under the inputs they were computed from."""
+        for stage in self.stages.values():
+            if stage.produces in values and all(value in values for value in stage.inputs):
+                output = values[stage.produces]
+                if self.memoizable(output):
+                    memo.put(memo.key(stage.name, *(values[v] for v in stage.inputs)), output)
+
+    def resumable(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Subset of `values` whose stage outputs have all of their upstream outputs present.
+
+        A stage output whose dependency has to be recomputed is dropped, so
+        it is recomputed from the new dependency rather than mixed with it.
+        """
+        kept = {value: values[value] for value in self.external_inputs() if value in values}
+        for name in self.order:
+            stage = self.stages[name]
+            if stage.produces in values and all(
+                    self.stages[dependency].produces in kept for dependency in self.dependencies(name)):
+                kept[stage.produces] = values[stage.produces]
+        return kept
+
+    async def run(self, values: Dict[str, Any], memo: Optional[StageMemo] = None,
+                  listener: Optional[StageListener] = None) -> Dict[str, Any]:
+        """Run every stage whose output is not already in `values`.
+
+        Args:
+            values (Dict): External inputs, plus any stage outputs that are
+                already known (those stages are skipped)
+            memo (StageMemo, optional): Reuse outputs of stages whose inputs
+                are unchanged; successful outputs are stored in it
+            listener (Callable, optional): Called with (event, stage, output or
+                error) as stages start, complete and fail; exceptions it raises
+                are logged and ignored
+
+        Returns:
+            Dict: `values` extended with every stage output
+
+        Raises:
+            KeyError: If an external input is missing
+            StageFailedError: If a stage raises; stages still running are cancelled
+        """
+        missing = [value for value in self.external_inputs() if value not in values]
+        if missing:
+            raise KeyError(f"Missing pipeline inputs: {', '.join(missing)}")
+
+        values = dict(values)
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        def notify(event: str, stage: Stage, detail: Any = None) -> None:
+            if listener is None:
+                return
+            try:
+                listener(event, stage.name, detail)
+            except Exception as e:
+                logger.warning(f"Stage listener failed on {event} for {stage.name}: {str(e)}")
+
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> None:
+            dependencies = [tasks[name] for name in self.dependencies(stage.name) if name in tasks]
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            args = [values[value] for value in stage.inputs]
+            key = memo.key(stage.name, *args) if memo is not None else None
+            if key is not None:
+                output = memo.get(key)
+                if output is not None:
+                    logger.info(f"Reusing memoized output of stage {stage.name}")
+                    values[stage.produces] = output
+                    notify(STAGE_STARTED, stage)
+                    notify(STAGE_COMPLETED, stage, output)
+                    return
+            async with limit:
+                logger.info(f"Running stage {stage.name}")
+                notify(STAGE_STARTED, stage)
+                try:
+                    output = await metrics.timed_stage(stage.name, stage.func(*args))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    notify(STAGE_FAILED, stage, e)
+                    raise StageFailedError(stage.name, e) from e
+            values[stage.produces] = output
+            # Tools report most failures as an error result rather than raising
+            failed = isinstance(output, dict) and output.get("status") == "error"
+            notify(STAGE_FAILED if failed else STAGE_COMPLETED, stage, output)
+            if key is not None and self.memoizable(output):
+                memo.put(key, output)
+
+        # Topological order: a stage's dependencies have their tasks before it does
+        for name in self.order:
+            stage = self.stages[name]
+            if stage.produces not in values:
+                tasks[name] = asyncio.create_task(run_stage(stage), name=f"stage-{name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return values
@@ -0,0 +1,130 @@
+"""Memoization of pipeline stage outputs keyed by their inputs.
+
+A stage's output is stored under a hash of the stage name and the values
+it read, so re-running the pipeline after an edit only recomputes stages
+whose inputs actually changed. Dialogue is memoized per scene, keyed by
+the scene and the profiles of the characters appearing in it, so editing
+one character only regenerates the dialogue of that character's scenes.
+The memo is only consulted by runs that opt in (script edits); a plain
+generation always recomputes its stages.
+"""
+import contextvars
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*values: Any) -> str:
+    """Stable hash of JSON-like values (dict key order does not matter)."""
+    payload = json.dumps(values, sort_keys=True, separators=(",", ":"),
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def character_profiles(characters: Any) -> Dict[str, Dict[str, Any]]:
+    """Map each character name in a character stage result to its profile."""
+    profiles: Dict[str, Dict[str, Any]] = {}
+
+    def visit(value: Any) -> None:
+        if isinstance(value, dict):
+            name = value.get("name")
+            if isinstance(name, str) and name.strip():
+                profiles[name.strip()] = value
+                return
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+
+    visit(characters)
+    return profiles
+
+
+def scene_characters(scene: Dict[str, Any], names: Iterable[str]) -> list:
+    """Names of the characters a scene lists or mentions (by full or first name)."""
+    listed = {str(name).strip().lower() for name in scene.get("characters", []) or []}
+    text = " ".join(str(scene.get(key, "")) for key in ("setting", "description", "purpose")).lower()
+    present = []
+    for name in names:
+        lowered = name.lower()
+        first = lowered.split()[0]
+        if (lowered in listed or first in listed
+                or re.search(rf"\b{re.escape(first)}\b", text)):
+            present.append(name)
+    return sorted(present)
+
+
+class StageMemo:
+    """Bounded in-memory LRU of stage outputs keyed by stage and inputs."""
+
+    def __init__(self, max_entries: int = 256):
+        """Initialize the memo.
+
+        Args:
+            max_entries (int): Outputs kept; 0 disables memoization
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "StageMemo":
+        """Create a memo sized by the STAGE_MEMO_SIZE environment variable."""
+        return cls(max_entries=int(os.getenv("STAGE_MEMO_SIZE", "256")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(stage: str, *inputs: Any) -> str:
+        return fingerprint(stage, *inputs)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a copy of the memoized output, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return copy.deepcopy(self._entries[key])
+
+    def put(self, key: str, output: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = copy.deepcopy(output)
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+
+# Shared by the script pipeline: whole-stage outputs and per-scene dialogue
+stage_memo = StageMemo.from_env()
+
+# Memo the stages of the current pipeline run may reuse outputs from, if any
+current_stage_memo: contextvars.ContextVar[Optional[StageMemo]] = contextvars.ContextVar(
+    "current_stage_memo", default=None
+)
@@ -2,6 +2,8 @@
 
 from typing import Dict, Optional
 from ..ai_service import ai_service
+from ..prompt_templates import templates
+from ..similarity_cache import similarity_cache
 
 async def create_characters(concept: str, genre: str = None) -> Dict:
     """Creates and develops characters using AI analysis.
@@ -19,6 +21,11 @@ async def create_characters(concept: str, genre: str = None) -> Dict:
             "error_message": "Story concept is required"
         }
 
+    # Near-duplicate concepts reuse an earlier result when the cache is enabled
+    cached = similarity_cache.lookup("character_creation", concept, genre)
+    if cached is not None:
+        return cached
+
     try:
         # Prepare context for AI
         context = {
@@ -27,17 +34,11 @@ async def create_characters(concept: str, genre: str = None) -> Dict:
             "request_type": "character_creation"
         }
 
-        prompt = f"""Analyze this story concept: "{concept}"
-        {f'Consider the {genre} genre conventions.' if genre else ''}
-        Create a cast of characters that would naturally emerge from this story.
-        Consider:
-        - Main character(s) with detailed personalities
-        - Supporting characters that enhance the story
-        - Antagonistic forces (not necessarily traditional villains)
-        - Character relationships and dynamics
-        - Character arcs and growth opportunities
-        - Cultural and demographic authenticity
-        """
+        prompt = templates.render(
+            "characters",
+            concept=concept,
+            genre_note=f"Consider the {genre} genre conventions. " if genre else ""
+        )
 
         # Get AI response
         response = await ai_service.generate_response(prompt, context)
@@ -45,14 +46,17 @@ async def create_characters(concept: str, genre: str = None) -> Dict:
         if response["status"] == "error":
             return response
 
-        return {
+        result = {
             "status": "success",
             "characters": response["content"],
             "metadata": {
                 "concept": concept,
-                "genre": genre
+                "genre": genre,
+                "near_hit": False
             }
         }
+        similarity_cache.store("character_creation", concept, genre, result)
+        return result
 
     except Exception as e:
         return {
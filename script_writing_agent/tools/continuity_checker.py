@@ -1,18 +1,117 @@
-"""Continuity checker module for script generation using AI."""
+"""Continuity checker module for script generation using AI.
 
-from typing import Dict, Optional
+Short scripts are checked in one call. Longer ones are split into
+overlapping windows of scenes that are checked in parallel, plus one pass
+over the character arcs of the whole script using a compact scene outline.
+The findings are merged into one report, with near-duplicates from
+overlapping windows combined.
+"""
+
+import asyncio
+import os
+import re
+from typing import Dict, List, Optional, Tuple
 from ..ai_service import ai_service
+from ..context_serializer import serialize_context
+from ..prompt_templates import templates
+from .dialogue_writer import list_scenes
+
+# Scenes per continuity window, and scenes shared by neighbouring windows
+CONTINUITY_WINDOW = int(os.getenv("CONTINUITY_WINDOW", "8"))
+CONTINUITY_OVERLAP = int(os.getenv("CONTINUITY_OVERLAP", "2"))
+
+# Word-set similarity at which two findings count as the same finding
+DUPLICATE_SIMILARITY = 0.75
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Function words ignored when comparing findings; names, scene numbers and
+# story words are kept, since they tell two findings apart
+_FILLER_WORDS = frozenset(
+    "a an the and or but of in on at to for from with by as is are was were be been "
+    "it its s this that these those there their they".split()
+)
+
+# Longest scene description kept in the character-arc outline
+OUTLINE_DESCRIPTION_CHARS = 160
+
+def plan_windows(count: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Split `count` scenes into (start, end) windows of `size` sharing `overlap` scenes."""
+    size = max(1, size)
+    step = max(1, size - max(0, overlap))
+    windows = []
+    start = 0
+    while True:
+        end = min(count, start + size)
+        windows.append((start, end))
+        if end >= count:
+            return windows
+        start += step
+
+def _outline(scene_items: List[Tuple[str, Dict]]) -> str:
+    """One line per scene: number, setting and the start of its description."""
+    lines = []
+    for number, (_, scene) in enumerate(scene_items, start=1):
+        description = str(scene.get("description", "")).strip()
+        if len(description) > OUTLINE_DESCRIPTION_CHARS:
+            description = description[:OUTLINE_DESCRIPTION_CHARS].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"Scene {number}: {scene.get('setting', '')} - {description}")
+    return "\n".join(lines)
+
+def _words(text: str) -> frozenset:
+    words = _WORD_RE.findall(text.lower())
+    return frozenset(word for word in words if word not in _FILLER_WORDS) or frozenset(words)
+
+def merge_findings(reports: List[Tuple[str, Dict]]) -> Dict[str, List[Dict]]:
+    """Merge findings from several checks, combining near-duplicates.
+
+    Args:
+        reports (List[Tuple[str, Dict]]): (source label, parsed continuity response)
+
+    Returns:
+        Dict: "issues" and "suggestions", each finding with its text, the
+            scenes it references and the checks that reported it
+    """
+    merged: Dict[str, List[Dict]] = {"issues": [], "suggestions": []}
+    for kind, findings in merged.items():
+        seen: List[frozenset] = []
+        for source, content in reports:
+            for finding in content.get(kind, []):
+                words = _words(finding["text"])
+                duplicate = None
+                for index, other in enumerate(seen):
+                    union = words | other
+                    if union and len(words & other) / len(union) >= DUPLICATE_SIMILARITY:
+                        duplicate = findings[index]
+                        break
+                if duplicate is None:
+                    findings.append({"text": finding["text"], "scenes": list(finding["scenes"]),
+                                     "sources": [source]})
+                    seen.append(words)
+                    continue
+                for ref in finding["scenes"]:
+                    if ref not in duplicate["scenes"]:
+                        duplicate["scenes"].append(ref)
+                if source not in duplicate["sources"]:
+                    duplicate["sources"].append(source)
+        for finding in findings:
+            finding["scenes"].sort(key=lambda ref: int(ref.rsplit("_", 1)[-1]))
+    return merged
 
-async def check_continuity(plot: Dict, characters: Dict, scenes: Dict) -> Dict:
+async def check_continuity(plot: Dict, characters: Dict, scenes: Dict,
+                           window: Optional[int] = None, overlap: Optional[int] = None) -> Dict:
     """Uses AI to analyze and ensure story continuity.
     
     Args:
         plot (Dict): Plot structure and story beats
         characters (Dict): Character profiles and arcs
         scenes (Dict): All scenes with dialogue
+        window (int, optional): Scenes per window, defaults to CONTINUITY_WINDOW
+        overlap (int, optional): Scenes shared by neighbouring windows, defaults to CONTINUITY_OVERLAP
         
     Returns:
-        Dict: AI-generated consistency analysis and suggestions
+        Dict: AI-generated consistency analysis and suggestions; with
+            status "partial" if some windows could not be checked
     """
     if not all([plot, characters, scenes]):
         return {
@@ -21,48 +120,71 @@ async def check_continuity(plot: Dict, characters: Dict, scenes: Dict) -> Dict:
         }
 
     try:
-        context = {
-            "plot": plot,
-            "characters": characters,
-            "scenes": scenes,
-            "request_type": "continuity_check"
-        }
+        scene_items = list_scenes(scenes)
+        window = window or CONTINUITY_WINDOW
+        overlap = CONTINUITY_OVERLAP if overlap is None else overlap
+        windows = plan_windows(len(scene_items), window, overlap)
 
-        prompt = f"""Analyze this script for continuity and consistency.
-        
-        Check for:
-        - Plot coherence and logic
-        - Character consistency and arc progression
-        - Timeline and causality
-        - Setting and world-building consistency
-        - Dialogue and tone consistency
-        - Emotional throughlines
-        - Resolution of plot threads
-        - Thematic consistency
-        
-        Provide:
-        - Identified issues
-        - Specific suggestions for improvement
-        - Potential plot holes or inconsistencies
-        - Character arc completion analysis
-        """
-
-        response = await ai_service.generate_response(prompt, context)
-        
-        if response["status"] == "error":
-            return response
+        if len(windows) == 1:
+            # Short script: one comprehensive check
+            context = {
+                "plot": plot,
+                "characters": characters,
+                "scenes": scenes,
+                "request_type": "continuity_check"
+            }
+            checks = [("script", ai_service.generate_response(templates.render("continuity"), context))]
+        else:
+            # Scenes go in the prompt so every window shares the plot/character prefix
+            context = {
+                "plot": plot,
+                "characters": characters,
+                "request_type": "continuity_check"
+            }
+            checks = []
+            for start, end in windows:
+                prompt = templates.render(
+                    "continuity_window",
+                    first=start + 1,
+                    last=end,
+                    scenes=serialize_context(dict(scene_items[start:end]))
+                )
+                checks.append((f"scenes {start + 1}-{end}", ai_service.generate_response(prompt, context)))
+            prompt = templates.render("continuity_arcs", outline=_outline(scene_items))
+            checks.append(("character arcs", ai_service.generate_response(prompt, context)))
 
-        return {
-            "status": "success",
-            "analysis": response["content"],
+        responses = await asyncio.gather(*(check for _, check in checks))
+
+        reports = []
+        failed = {}
+        for (source, _), response in zip(checks, responses):
+            if response["status"] == "error":
+                failed[source] = response.get("error", "Unknown error")
+            else:
+                reports.append((source, response["content"]))
+
+        if not reports:
+            return {
+                "status": "error",
+                "message": "Error checking continuity for every part of the script",
+                "errors": failed
+            }
+
+        result = {
+            "status": "partial" if failed else "success",
+            "analysis": merge_findings(reports),
             "metadata": {
-                "check_type": "comprehensive",
+                "check_type": "sharded" if len(checks) > 1 else "comprehensive",
+                "checks": [source for source, _ in checks],
                 "component_count": {
-                    "scenes": len(scenes),
+                    "scenes": len(scene_items),
                     "characters": len(characters)
                 }
             }
         }
+        if failed:
+            result["errors"] = failed
+        return result
 
     except Exception as e:
         return {
@@ -1,65 +1,146 @@
 """Dialogue writer module for script generation."""
 
-from typing import Dict
+import os
+from typing import Dict, List, Optional, Tuple
 from ..ai_service import ai_service
+from ..prompt_templates import templates
+from ..stage_memo import character_profiles, current_stage_memo, scene_characters, stage_memo
 
-async def create_dialogue(scenes: Dict, characters: Dict) -> Dict:
+# Maximum number of dialogue batches generated concurrently
+DIALOGUE_CONCURRENCY = int(os.getenv("DIALOGUE_CONCURRENCY", "8"))
+
+def list_scenes(scenes: Dict) -> List[Tuple[str, Dict]]:
+    """List (scene_id, scene) pairs from a scene stage result or a plain mapping."""
+    payload = scenes.get("scenes", scenes)
+    # The scene stage wraps the structured response: {"scenes": {"scenes": [...]}}
+    if isinstance(payload, dict) and isinstance(payload.get("scenes"), (list, dict)):
+        payload = payload["scenes"]
+    if isinstance(payload, list):
+        return [(scene.get("id", f"scene_{i + 1}"), scene)
+                for i, scene in enumerate(payload) if isinstance(scene, dict)]
+    return [(scene_id, scene) for scene_id, scene in payload.items() if isinstance(scene, dict)]
+
+def scene_dialogue_key(scene: Dict, profiles: Dict[str, Dict]) -> str:
+    """Memo key of one scene's dialogue: the scene and the profiles of its characters."""
+    present = scene_characters(scene, profiles)
+    return stage_memo.key(
+        "dialogue_scene",
+        {k: v for k, v in scene.items() if k != "id"},
+        {name: profiles[name] for name in present}
+    )
+
+def remember_dialogue(scenes: Dict, characters: Dict, dialogue: Dict) -> None:
+    """Memoize an existing dialogue stage result under its scenes and characters."""
+    profiles = character_profiles(characters)
+    generated = dialogue.get("scenes", {}) if isinstance(dialogue, dict) else {}
+    for scene_id, scene in list_scenes(scenes):
+        if scene_id in generated:
+            stage_memo.put(scene_dialogue_key(scene, profiles), generated[scene_id])
+
+def _dialogue_prompt(scene: Dict) -> str:
+    """Build the dialogue prompt for one scene."""
+    return templates.render(
+        "dialogue",
+        setting=scene.get('setting', ''),
+        description=scene.get('description', ''),
+        mood=scene.get('mood', ''),
+        purpose=scene.get('purpose', ''),
+        characters=', '.join(scene.get('characters', []))
+    )
+
+async def create_dialogue(scenes: Dict, characters: Dict, batch_size: Optional[int] = None,
+                          max_concurrency: Optional[int] = None) -> Dict:
     """Generates natural dialogue for scenes using AI analysis.
-    
+
+    Scenes are sent to the model in batches (see AIService.generate_batch),
+    so a script with many scenes needs only a few model calls, and up to
+    `max_concurrency` batches run in parallel. A scene that fails does not
+    affect the others: its error is reported under "errors" and the stage
+    status becomes "partial". When the pipeline run uses a stage memo (script
+    edits), scenes whose content and characters are unchanged since an
+    earlier run reuse that run's dialogue. A failed or empty scene stage is
+    an error, not an empty success.
+
     Args:
         scenes (Dict): Scene contexts and descriptions
         characters (Dict): Character profiles and relationships
-        
+        batch_size (int, optional): Scenes per model call, defaults to BATCH_SIZE
+        max_concurrency (int, optional): Batches in flight at once, defaults to DIALOGUE_CONCURRENCY
+
     Returns:
-        Dict: Scenes with AI-generated dialogue
+        Dict: Scenes with AI-generated dialogue, in scene order
     """
     if not scenes or not characters:
         return {
             "status": "error",
             "error_message": "Missing scene or character information"
         }
-        
+
+    if scenes.get("status") == "error":
+        return {
+            "status": "error",
+            "error_message": f"Scene generation failed: {scenes.get('error_message') or scenes.get('error', 'Unknown error')}"
+        }
+
     try:
+        scene_items = list_scenes(scenes)
+        if not scene_items:
+            return {
+                "status": "error",
+                "error_message": "No scenes to write dialogue for"
+            }
+
+        # Characters are shared by every scene; each scene's details are in its prompt
+        context = {
+            "characters": characters,
+            "request_type": "dialogue_generation"
+        }
+
+        memo = current_stage_memo.get()
+        profiles = character_profiles(characters)
+        keys = [scene_dialogue_key(scene, profiles) for _, scene in scene_items]
+        reused = {i: memo.get(key) if memo is not None else None for i, key in enumerate(keys)}
+        pending = [i for i, content in reused.items() if content is None]
+
+        prompts = [_dialogue_prompt(scene_items[i][1]) for i in pending]
+        responses = await ai_service.generate_batch(
+            prompts, context, max_batch_size=batch_size,
+            max_concurrency=max_concurrency or DIALOGUE_CONCURRENCY
+        )
+        generated = dict(zip(pending, responses))
+
         dialogue_scenes = {}
-        
-        for scene_id, scene in scenes.items():
-            # Generate dialogue for each scene
-            context = {
-                "scene": scene,
-                "characters": characters,
-                "request_type": "dialogue_generation",
-                "scene_id": scene_id
+        errors = {}
+        for i, (scene_id, _) in enumerate(scene_items):
+            response = generated.get(i)
+            if response is None:
+                dialogue_scenes[scene_id] = reused[i]
+            elif response["status"] == "error":
+                errors[scene_id] = response.get("error", "Unknown error")
+            else:
+                dialogue_scenes[scene_id] = response["content"]
+                if memo is not None:
+                    memo.put(keys[i], response["content"])
+
+        if errors and not dialogue_scenes:
+            return {
+                "status": "error",
+                "message": "Error generating dialogue for every scene",
+                "errors": errors
+            }
+
+        result = {
+            "status": "partial" if errors else "success",
+            "scenes": dialogue_scenes,
+            "metadata": {
+                "generated_scenes": [scene_items[i][0] for i in pending],
+                "reused_scenes": len(scene_items) - len(pending)
             }
-            
-            prompt = f"""For this scene:
-            Setting: {scene.get('setting', '')}
-            Mood: {scene.get('mood', '')}
-            Purpose: {scene.get('purpose', '')}
-            
-            Generate natural dialogue between these characters:
-            {', '.join(scene.get('characters', []))}
-            
-            Consider:
-            - Each character's unique voice and personality
-            - Scene mood and emotional context
-            - Story progression and character arcs
-            - Subtext and dramatic tension
-            - Natural conversation flow
-            - Character relationships and dynamics
-            """
-            
-            response = await ai_service.generate_response(prompt, context)
-            
-            if response["status"] == "error":
-                return response
-                
-            dialogue_scenes[scene_id] = response["content"]
-        
-        return {
-            "status": "success",
-            "scenes": dialogue_scenes
         }
-        
+        if errors:
+            result["errors"] = errors
+        return result
+
     except Exception as e:
         return {
             "status": "error",
@@ -2,6 +2,8 @@
 
 from typing import Dict, Optional
 from ..ai_service import ai_service
+from ..prompt_templates import templates
+from ..similarity_cache import similarity_cache
 
 async def create_plot(concept: str, genre: str = None) -> Dict:
     """Analyzes user's concept and generates a dynamic plot structure using AI.
@@ -19,6 +21,11 @@ async def create_plot(concept: str, genre: str = None) -> Dict:
             "error_message": "Story concept is required"
         }
 
+    # Near-duplicate concepts reuse an earlier result when the cache is enabled
+    cached = similarity_cache.lookup("plot_creation", concept, genre)
+    if cached is not None:
+        return cached
+
     try:
         # Prepare context for AI
         context = {
@@ -28,19 +35,11 @@ async def create_plot(concept: str, genre: str = None) -> Dict:
         }
 
         # Generate AI prompt
-        prompt = f"""Based on this story concept: "{concept}"
-        {f'Taking into account {genre} genre elements,' if genre else ''}
-        create a compelling and original plot structure.
-        
-        Consider:
-        - Natural story progression and pacing
-        - Key plot points and turning points
-        - Thematic elements and motifs
-        - Character development opportunities
-        - Conflict escalation and resolution
-        - Subplot integration
-        - Story stakes and tension
-        """
+        prompt = templates.render(
+            "plot",
+            concept=concept,
+            genre_note=f"Taking into account {genre} genre elements, " if genre else ""
+        )
 
         # Get AI response
         response = await ai_service.generate_response(prompt, context)
@@ -48,14 +47,17 @@ async def create_plot(concept: str, genre: str = None) -> Dict:
         if response["status"] == "error":
             return response
 
-        return {
+        result = {
             "status": "success",
             "plot": response["content"],
             "metadata": {
                 "concept": concept,
-                "genre": genre
+                "genre": genre,
+                "near_hit": False
             }
         }
+        similarity_cache.store("plot_creation", concept, genre, result)
+        return result
 
     except Exception as e:
         return {
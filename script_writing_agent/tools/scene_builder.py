@@ -2,6 +2,7 @@
 
 from typing import Dict, Optional
 from ..ai_service import ai_service
+from ..prompt_templates import templates
 
 async def create_scenes(plot: Dict, characters: Dict) -> Dict:
     """Generates dynamic scene sequences using AI analysis.
@@ -26,18 +27,7 @@ async def create_scenes(plot: Dict, characters: Dict) -> Dict:
             "request_type": "scene_creation"
         }
 
-        prompt = f"""Based on this plot structure and these characters,
-        create a sequence of compelling scenes that bring the story to life.
-        
-        For each scene, consider:
-        - Visual setting and atmosphere
-        - Character presence and interactions
-        - Dramatic purpose and story progression
-        - Emotional impact and pacing
-        - Visual storytelling opportunities
-        - Scene transitions and flow
-        - Technical considerations (camera, lighting, staging)
-        """
+        prompt = templates.render("scenes")
 
         response = await ai_service.generate_response(prompt, context)
         
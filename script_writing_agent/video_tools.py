@@ -2,29 +2,44 @@ import os
 import json
 import tempfile
 import subprocess
-from typing import Dict, Any
-import elevenlabs
+from typing import Dict, Any, Optional
+
+from .http_transport import http_client
+
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+
+# Voice name -> voice id, listed once per process
+_voice_ids: Dict[str, str] = {}
+
+def _elevenlabs_headers() -> Dict[str, str]:
+    return {"xi-api-key": os.getenv("ELEVENLABS_API_KEY", "")}
+
+def _voice_id(voice_name: str) -> Optional[str]:
+    """Find a voice by name (or fall back to the first available one)."""
+    if not _voice_ids:
+        response = http_client.get(f"{ELEVENLABS_API_URL}/voices", headers=_elevenlabs_headers())
+        response.raise_for_status()
+        for voice in response.json().get("voices", []):
+            _voice_ids.setdefault(voice["name"].lower(), voice["voice_id"])
+    return _voice_ids.get(voice_name.lower()) or next(iter(_voice_ids.values()), None)
 
 def generate_audio(text: str, voice_name: str = "Bella") -> bytes:
     """Generate audio using ElevenLabs API"""
-    # Set the API key
-    elevenlabs.set_api_key(os.getenv("ELEVENLABS_API_KEY"))
-    
     try:
-        # Get all available voices
-        available_voices = elevenlabs.voices()
-        
         # Find the requested voice or use the first available one
-        voice = next((v for v in available_voices if v.name.lower() == voice_name.lower()), available_voices[0])
-        
-        # Generate the audio
-        audio = elevenlabs.generate(
-            text=text,
-            voice=voice.name,
-            model="eleven_multilingual_v2"
+        voice_id = _voice_id(voice_name)
+        if voice_id is None:
+            raise Exception("No ElevenLabs voices available")
+
+        # Generate the audio over the shared keep-alive connection pool
+        response = http_client.post(
+            f"{ELEVENLABS_API_URL}/text-to-speech/{voice_id}",
+            headers={**_elevenlabs_headers(), "Accept": "audio/mpeg"},
+            json={"text": text, "model_id": "eleven_multilingual_v2"}
         )
-        
-        return audio
+        response.raise_for_status()
+
+        return response.content
         
     except Exception as e:
         print(f"Error generating audio: {str(e)}")
@@ -55,7 +70,8 @@ def video_generator(script: dict, scene_metadata: dict, character_info: dict) ->
                     audio = generate_audio(text, character_info.get('voices', {}).get(character, 'Bella'))
                     if audio:
                         audio_file = os.path.join(temp_dir, f"{character}_{len(audio_files)}.mp3")
-                        elevenlabs.save(audio, audio_file)
+                        with open(audio_file, 'wb') as f:
+                            f.write(audio)
                         audio_files[f"{character}_{dialogue.get('id')}"] = audio_file
                 except Exception as e:
                     print(f"Failed to generate audio for {character}: {str(e)}")
@@ -0,0 +1,57 @@
+"""Regression tests for circuit breaker bookkeeping in the AI service."""
+import asyncio
+import os
+
+os.environ.setdefault("AI_BACKEND", "mock")
+os.environ.setdefault("GEMINI_RPM", "100000")
+
+from script_writing_agent.ai_service import AIService
+from script_writing_agent.backends import MockBackend
+from script_writing_agent.circuit_breaker import HALF_OPEN, CircuitBreakers
+from script_writing_agent.prefix_cache import PrefixCache
+from script_writing_agent.prompt_templates import join_prompt
+from script_writing_agent.routing import DEFAULT_GENERATION_CONFIG, RouteChoice
+
+
+class SlowPrefixBackend(MockBackend):
+    """Mock backend whose prefix cache creation never finishes on its own."""
+
+    async def create_prefix_cache(self, model_name, prefix, ttl_seconds):
+        await asyncio.sleep(3600)
+
+
+def test_cancelled_prefix_creation_releases_half_open_probe():
+    async def scenario():
+        backend = SlowPrefixBackend(latency_mu=-8, latency_sigma=0.1, seed=1)
+        service = AIService(backend=backend)
+        service.breakers = CircuitBreakers(open_seconds=0.0, half_open_probes=2)
+        service.prefix_cache = PrefixCache(enabled=True, min_tokens=0)
+        service.fallback = "none"
+
+        model = backend.default_model()
+        breaker = service.breakers._breaker(model)
+        breaker._open()  # open_seconds=0: the next call is a half-open probe
+
+        route = RouteChoice(model, dict(DEFAULT_GENERATION_CONFIG))
+        prefix = "Shared story context"
+        full_prompt = join_prompt(prefix, "Write a plot")
+
+        for _ in range(2):
+            task = asyncio.create_task(
+                service._fetch_text(route, full_prompt, "plot_creation", None, prefix)
+            )
+            await asyncio.sleep(0.01)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        assert breaker.state == HALF_OPEN
+        assert breaker._probes_in_flight == 0
+
+        # Probe slots are free again, so a call without a prefix goes through
+        result = await service._fetch_text(route, "Write a plot", "plot_creation")
+        assert result.text
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+"""Regression tests for single-flight request coalescing."""
+import asyncio
+
+from script_writing_agent.single_flight import SingleFlight
+
+
+def test_caller_after_last_waiter_cancelled_starts_a_new_flight():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(len(calls))
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        first = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        # Runs right after the cancelled waiter, before the abandoned task has finished
+        second = asyncio.create_task(flight.do("key", work))
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+
+        result = await second
+
+        assert result == 2
+        assert len(calls) == 2
+        assert flight.stats["abandoned"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+
+        assert results == ["done"] * 3
+        assert len(calls) == 1
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())